@@ -1,28 +1,103 @@
-
+import os
 import uuid
-import json
+import orjson
+import random
 import hashlib
 import asyncio
+import socket
+import struct
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List, Tuple
+from collections import Counter
 from sqlalchemy.orm import Session
 from fastapi import Request
 from .models import AuditLog
 from .database import SessionLocal
 
+# Dedicated pool so audit writes never compete with request handlers for the default
+# executor, and hold at most one DB connection (batches are written one at a time)
+_audit_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit")
+atexit.register(_audit_pool.shutdown, wait=True)
+
+def _load_sample_rates() -> Dict[Tuple[str, str], float]:
+    """
+    Parses AUDIT_SAMPLE_RATES, e.g. '{"USER_LOGIN:FAILURE": 0.1}'.
+    Events without an entry are always logged.
+    """
+    raw = os.getenv("AUDIT_SAMPLE_RATES")
+    if not raw:
+        return {}
+    try:
+        rates = {}
+        for key, rate in orjson.loads(raw).items():
+            action, status = key.split(":", 1)
+            rates[(action, status)] = float(rate)
+        return rates
+    except Exception as e:
+        print(f"⚠️ Ignoring invalid AUDIT_SAMPLE_RATES: {str(e)}")
+        return {}
+
+_SAMPLE_RATES = _load_sample_rates()
+
 class AuditLogger:
+    # Events are buffered and written in a single transaction per batch
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 0.5  # seconds
+    QUEUE_MAXSIZE = 10000
+    # Counts of events dropped by sampling are written as one summary row per interval
+    SAMPLE_SUMMARY_INTERVAL = 60  # seconds
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._summary_task: Optional[asyncio.Task] = None
+        self._sampled_out: Counter = Counter()
+
     @staticmethod
+    @lru_cache(maxsize=4096)
     def mask_ip(ip: Optional[str]) -> str:
         if not ip:
             return "unknown"
-        # Mask the last part of the IP for privacy
-        parts = ip.split(".")
-        if len(parts) == 4:
-            return f"{parts[0]}.{parts[1]}.{parts[2]}.xxx"
-        return "masked"
+        ip = ip.strip()
+        # Mask the last octet of IPv4 / the interface half of IPv6 for privacy
+        try:
+            return "%d.%d.%d.xxx" % struct.unpack("BBB", socket.inet_pton(socket.AF_INET, ip)[:3])
+        except OSError:
+            pass
+        try:
+            return "%x:%x:%x:%x:xxxx:xxxx:xxxx:xxxx" % struct.unpack("!HHHH", socket.inet_pton(socket.AF_INET6, ip)[:8])
+        except OSError:
+            return "masked"
+
+    def start(self):
+        """Starts the background flusher on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._flusher_task is not None and not self._flusher_task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.QUEUE_MAXSIZE)
+        self._flusher_task = loop.create_task(self._flusher())
+        if _SAMPLE_RATES:
+            self._summary_task = loop.create_task(self._summarizer())
+
+    async def shutdown(self):
+        """Flushes everything still queued and stops the background flusher."""
+        if self._flusher_task is None or self._flusher_task.done():
+            return
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+        self._enqueue_sample_summary()
+        await self._queue.put(None)  # Sentinel: flush and exit
+        await self._flusher_task
+        self._flusher_task = None
 
-    @staticmethod
     async def log_event(
+        self,
         action: str,
         status: str,
         user_id: Optional[int] = None,
@@ -31,15 +106,21 @@ class AuditLogger:
         metadata: Optional[Dict[str, Any]] = None
     ):
         """
-        Logs an audit event asynchronously to avoid blocking the main thread.
+        Queues an audit event; a background task writes queued events in batches.
         """
-        # Prepare log data
-        log_id = str(uuid.uuid4())
+        # Sample high-volume streams (e.g. brute-force login failures) when configured
+        rate = _SAMPLE_RATES.get((action, status), 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self._sampled_out[f"{action}:{status}"] += 1
+            return
+
+        # log_id is assigned by the audit writer thread; the timestamp is taken here
+        # because the row is only written when its batch is flushed
         timestamp = datetime.utcnow()
-        
+
         ip_address = "unknown"
         user_agent = "unknown"
-        
+
         if request:
             # Get IP from request
             forwarded = request.headers.get("X-Forwarded-For")
@@ -47,34 +128,111 @@ class AuditLogger:
                 ip_address = AuditLogger.mask_ip(forwarded.split(",")[0])
             else:
                 ip_address = AuditLogger.mask_ip(request.client.host if request.client else None)
-            
+
             user_agent = request.headers.get("User-Agent", "unknown")
 
-        # Run the database insertion in a separate thread to be non-blocking
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, AuditLogger._save_to_db, log_id, timestamp, user_id, action, status, source, ip_address, user_agent, metadata)
+        self.start()
+        await self._queue.put({
+            "timestamp": timestamp,
+            "user_id": user_id,
+            "action": action,
+            "status": status,
+            "source": source,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "metadata_json": metadata
+        })
+
+    def _enqueue_sample_summary(self):
+        if not self._sampled_out:
+            return
+        counts, self._sampled_out = dict(self._sampled_out), Counter()
+        try:
+            self._queue.put_nowait({
+                "timestamp": datetime.utcnow(),
+                "user_id": None,
+                "action": "AUDIT_SAMPLED_OUT",
+                "status": "SUCCESS",
+                "source": "system",
+                "ip_address": None,
+                "user_agent": None,
+                "metadata_json": {"dropped": counts, "interval_s": self.SAMPLE_SUMMARY_INTERVAL}
+            })
+        except asyncio.QueueFull:
+            # Keep the counts for the next interval rather than losing them
+            self._sampled_out.update(counts)
+
+    async def _summarizer(self):
+        while True:
+            await asyncio.sleep(self.SAMPLE_SUMMARY_INTERVAL)
+            self._enqueue_sample_summary()
+
+    async def _flusher(self):
+        # Bind hot lookups once; the loop and queue are fixed for the task's lifetime
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        run_in_executor = loop.run_in_executor
+        stopping = False
+        while not stopping:
+            first = await queue.get()
+            if first is None:
+                break
+            rows = [first]
+            deadline = loop.time() + self.FLUSH_INTERVAL
+            while len(rows) < self.BATCH_SIZE:
+                # Take what is already queued without scheduling a timeout per row
+                if not queue.empty():
+                    row = queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+            # Run the database insertion in the audit thread to be non-blocking
+            await run_in_executor(_audit_pool, AuditLogger._bulk_write, rows)
 
     @staticmethod
-    def _save_to_db(log_id, timestamp, user_id, action, status, source, ip_address, user_agent, metadata):
+    def _bulk_write(rows: List[Dict[str, Any]]):
+        # Ids are generated here, on the audit thread, so log_event does no uuid/urandom work
+        for row in rows:
+            row["log_id"] = str(uuid.uuid4())
         db = SessionLocal()
         try:
-            new_log = AuditLog(
-                log_id=log_id,
-                timestamp=timestamp,
-                user_id=user_id,
-                action=action,
-                status=status,
-                source=source,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                metadata_json=metadata
-            )
-            db.add(new_log)
+            # Core executemany: one multi-row INSERT, no ORM objects or identity map
+            db.execute(AuditLog.__table__.insert(), rows)
             db.commit()
         except Exception as e:
-            print(f"❌ Audit Logging Error: {str(e)}")
             db.rollback()
+            if len(rows) == 1:
+                print(f"❌ Audit Logging Error: {str(e)}")
+            else:
+                # One bad row (e.g. an unserializable metadata payload) must not cost the whole batch:
+                # retry row by row so only the offending events are lost
+                print(f"⚠️ Audit batch of {len(rows)} failed, retrying row by row: {str(e)}")
+                AuditLogger._write_rows_individually(db, rows)
         finally:
             db.close()
 
+    @staticmethod
+    def _write_rows_individually(db: Session, rows: List[Dict[str, Any]]):
+        insert = AuditLog.__table__.insert()
+        failed = 0
+        for row in rows:
+            try:
+                db.execute(insert, row)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                print(f"❌ Audit Logging Error ({row.get('action')}): {str(e)}")
+        if failed:
+            print(f"❌ Dropped {failed} of {len(rows)} audit events")
+
 audit_logger = AuditLogger()
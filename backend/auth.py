@@ -1,14 +1,17 @@
 # backend/auth.py
 import os
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from dotenv import load_dotenv
 load_dotenv()
-from .database import get_db
+from .database import get_async_db
 from .models import User
 from .schemas import TokenOut, UserCreate, RefreshTokenIn, ForgotPasswordRequest, PasswordResetConfirm
 from .audit_logger import audit_logger
@@ -16,9 +19,23 @@ from .email_service import email_service
 from .models import PasswordResetToken
 import secrets
 import hashlib
+import hmac
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache, TLRUCache
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2id is the default; existing bcrypt hashes still verify and are upgraded on next login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated=["bcrypt"],
+    argon2__type="id",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1
+)
 
 # JWT config
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
@@ -27,25 +44,103 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+ACCESS_TTL_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TTL_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 86400
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Password hashing runs off the event loop. argon2-cffi and bcrypt release the GIL inside
+# their C code, so a thread pool sized to the CPU count hashes in parallel across cores.
+_hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="pwhash")
+
+async def run_hash(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+
+# Successful password checks are remembered briefly so repeated logins skip bcrypt.
+# Keys are HMAC'd with the server secret and include the stored hash, so a password
+# change invalidates the entry and no plaintext is kept in memory.
+_verify_cache = TTLCache(maxsize=10_000, ttl=60)
+_verify_cache_lock = threading.Lock()
+
+def _cached_verify(plain_password: str, hashed_password: str, user_id: int) -> bool:
+    key = hmac.new(
+        SECRET_KEY.encode(),
+        f"{user_id}:{hashed_password}:{plain_password}".encode(),
+        hashlib.sha256
+    ).digest()
+    with _verify_cache_lock:
+        if key in _verify_cache:
+            return True
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False
+    with _verify_cache_lock:
+        _verify_cache[key] = True
+    return True
+
+# Verified against when the email is unknown so both login failure paths cost one hash check.
+# Creating it also loads the argon2 backend at worker start instead of on the first login.
+_DUMMY_HASH = pwd_context.hash("dummy-never-matches-" + secrets.token_hex(16))
+
+def _warm_crypto_backends():
+    try:
+        # Legacy bcrypt hashes still verify, so load that backend up front too
+        pwd_context.handler("bcrypt").get_backend()
+        jwt.decode(jwt.encode({"warmup": 1}, SECRET_KEY, algorithm=ALGORITHM), SECRET_KEY, algorithms=[ALGORITHM])
+    except Exception as e:
+        print(f"⚠️ Crypto warmup skipped: {str(e)}")
+
+_warm_crypto_backends()
+
+# Validated bearer tokens map to the minimal user fields routes rely on, so authenticated
+# requests skip the per-request user lookup. Entries are short-lived so deactivations
+# take effect quickly, and never outlive the token's own expiry.
+_token_user_cache = TTLCache(maxsize=50_000, ttl=30)
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+# Decoded JWT payloads, so a reused bearer token is not re-verified on every request.
+# Each entry expires at the token's own "exp" (capped at 60s); failed decodes are never cached.
+_jwt_cache = TLRUCache(
+    maxsize=50_000,
+    ttu=lambda _key, payload, now: min(payload.get("exp", 0), now + 60),
+    timer=time.time
+)
+_jwt_cache_lock = threading.Lock()
+
+def _decode_cached(token: str) -> dict:
+    key = _token_cache_key(token)
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None:
+        return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if payload.get("exp", 0) > time.time():
+        with _jwt_cache_lock:
+            _jwt_cache[key] = payload
+    return payload
+
 def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     # Ensure role is included if present in data
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode = {**data, "exp": int(time.time()) + ACCESS_TTL_SECONDS, "type": "access"}
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode = {**data, "exp": int(time.time()) + REFRESH_TTL_SECONDS, "type": "refresh"}
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 @router.post("/signup", response_model=TokenOut)
-async def signup(payload: UserCreate, request: Request, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == payload.email).first()
-    if existing:
+async def signup(payload: UserCreate, request: Request, db: AsyncSession = Depends(get_async_db)):
+    hashed_password = await run_hash(pwd_context.hash, payload.password)
+    # Single round-trip: the unique index on email decides, no SELECT-then-INSERT race
+    stmt = (
+        pg_insert(User)
+        .values(email=payload.email, password=hashed_password, role="USER")
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.id, User.email, User.role)
+    )
+    user = (await db.execute(stmt)).first()
+    await db.commit()
+    if user is None:
         await audit_logger.log_event(
             action="USER_SIGNUP",
             status="FAILURE",
@@ -54,12 +149,6 @@ async def signup(payload: UserCreate, request: Request, db: Session = Depends(ge
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
     
-    hashed_password = pwd_context.hash(payload.password)
-    user = User(email=payload.email, password=hashed_password, role="USER")
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    
     await audit_logger.log_event(
         action="USER_SIGNUP",
         status="SUCCESS",
@@ -79,10 +168,17 @@ async def signup(payload: UserCreate, request: Request, db: Session = Depends(ge
     }
 
 @router.post("/login", response_model=TokenOut)
-async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.scalars(select(User).where(User.email == form_data.username))).first()
     
-    if not user or not pwd_context.verify(form_data.password, user.password):
+    if user is None:
+        # Equalize timing with the known-email path so emails can't be enumerated
+        await run_hash(pwd_context.verify, form_data.password, _DUMMY_HASH)
+        user_ok = False
+    else:
+        user_ok = await run_hash(_cached_verify, form_data.password, user.password, user.id)
+
+    if not user_ok:
         await audit_logger.log_event(
             action="USER_LOGIN",
             status="FAILURE",
@@ -94,6 +190,11 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account is deactivated.")
 
+    # Transparently upgrade legacy bcrypt hashes (or outdated argon2 params)
+    if pwd_context.needs_update(user.password):
+        user.password = await run_hash(pwd_context.hash, form_data.password)
+        await db.commit()
+
     await audit_logger.log_event(
         action="USER_LOGIN",
         status="SUCCESS",
@@ -113,14 +214,24 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
     }
 
 @router.post("/refresh", response_model=TokenOut)
-async def refresh_token(payload: RefreshTokenIn, request: Request, db: Session = Depends(get_db)):
+async def refresh_token(payload: RefreshTokenIn, request: Request, db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED, 
         detail="Could not validate refresh token", 
         headers={"WWW-Authenticate": "Bearer"}
     )
     try:
-        decoded_payload = jwt.decode(payload.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Cheap claim checks first so stale or wrong-type tokens skip signature verification
+        unverified = jwt.get_unverified_claims(payload.refresh_token)
+        if unverified.get("type") != "refresh" or unverified.get("exp", 0) < time.time():
+            await audit_logger.log_event(
+                action="TOKEN_REFRESH",
+                status="FAILURE",
+                request=request,
+                metadata={"reason": "Expired or non-refresh token"}
+            )
+            raise credentials_exception
+        decoded_payload = _decode_cached(payload.refresh_token)
         email: str = decoded_payload.get("sub")
         token_type: str = decoded_payload.get("type")
         if email is None or token_type != "refresh":
@@ -140,7 +251,7 @@ async def refresh_token(payload: RefreshTokenIn, request: Request, db: Session =
         )
         raise credentials_exception
         
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.scalars(select(User).where(User.email == email))).first()
     if user is None:
         await audit_logger.log_event(
             action="TOKEN_REFRESH",
@@ -170,19 +281,32 @@ async def refresh_token(payload: RefreshTokenIn, request: Request, db: Session =
     }
 
 # Dependency to get user object from token
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Returns a detached User: routes that write to the user must re-load it from their session
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+    cache_key = _token_cache_key(token)
+    cached = _token_user_cache.get(cache_key)
+    if cached is not None:
+        user_fields, exp = cached
+        if exp > time.time():
+            return User(**user_fields)
+        _token_user_cache.pop(cache_key, None)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _decode_cached(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    # Column-only lookup: no ORM instance or identity-map bookkeeping on the hot path
+    row = (await db.execute(
+        select(User.id, User.email, User.role, User.is_active).where(User.email == email)
+    )).first()
+    if row is None:
         raise credentials_exception
-    return user
+    user_fields = row._asdict()
+    _token_user_cache[cache_key] = (user_fields, payload.get("exp", 0))
+    return User(**user_fields)
 
 async def get_current_owner(current_user: User = Depends(get_current_user)):
     if current_user.role != "OWNER":
@@ -193,11 +317,12 @@ async def get_current_owner(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.post("/logout")
-async def logout(request: Request, current_user: User = Depends(get_current_user)):
+async def logout(request: Request, token: str = Depends(oauth2_scheme), current_user: User = Depends(get_current_user)):
     """
     Log a user logout event. 
     In stateless JWT, actual 'logout' happens on client side by deleting the token.
     """
+    _token_user_cache.pop(_token_cache_key(token), None)
     await audit_logger.log_event(
         action="USER_LOGOUT",
         status="SUCCESS",
@@ -208,12 +333,12 @@ async def logout(request: Request, current_user: User = Depends(get_current_user
     return {"message": "Logged out successfully"}
 
 @router.post("/forgot-password")
-async def forgot_password(payload: ForgotPasswordRequest, request: Request, db: Session = Depends(get_db)):
+async def forgot_password(payload: ForgotPasswordRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Generate a secure reset token and send it via Gmail SMTP.
     Follows security best practices by not revealing if an email exists.
     """
-    user = db.query(User).filter(User.email == payload.email).first()
+    user = (await db.scalars(select(User).where(User.email == payload.email))).first()
     
     if user:
         # 1. Generate secure random token
@@ -230,10 +355,10 @@ async def forgot_password(payload: ForgotPasswordRequest, request: Request, db:
             expires_at=expiry
         )
         db.add(reset_token)
-        db.commit()
+        await db.commit()
         
-        # 4. Send email (Async or background task would be better, but direct is fine for MVP)
-        email_sent = email_service.send_password_reset_email(user.email, raw_token)
+        # 4. Queue email; pooled SMTP workers deliver it off the request path
+        email_sent = await email_service.send_password_reset_email(user.email, raw_token)
         
         await audit_logger.log_event(
             action="FORGOT_PASSWORD_REQUEST",
@@ -254,18 +379,18 @@ async def forgot_password(payload: ForgotPasswordRequest, request: Request, db:
     return {"message": "If the account exists, a reset email has been sent."}
 
 @router.post("/reset-password")
-async def reset_password(payload: PasswordResetConfirm, request: Request, db: Session = Depends(get_db)):
+async def reset_password(payload: PasswordResetConfirm, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Verify reset token hash, check expiry, and update password.
     """
     token_hash = hashlib.sha256(payload.token.encode()).hexdigest()
     
     # 1. Find valid, unused token
-    reset_entry = db.query(PasswordResetToken).filter(
+    reset_entry = (await db.scalars(select(PasswordResetToken).where(
         PasswordResetToken.token_hash == token_hash,
         PasswordResetToken.used == 0,
         PasswordResetToken.expires_at > datetime.utcnow()
-    ).first()
+    ))).first()
     
     if not reset_entry:
         await audit_logger.log_event(
@@ -280,17 +405,17 @@ async def reset_password(payload: PasswordResetConfirm, request: Request, db: Se
         )
     
     # 2. Get user and update password
-    user = db.query(User).filter(User.id == reset_entry.user_id).first()
+    user = await db.get(User, reset_entry.user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
     
     # 3. Securely hash and update
-    user.password = pwd_context.hash(payload.new_password)
+    user.password = await run_hash(pwd_context.hash, payload.new_password)
     
     # 4. Mark token as used
     reset_entry.used = 1
     
-    db.commit()
+    await db.commit()
     
     await audit_logger.log_event(
         action="PASSWORD_RESET_CONFIRM",
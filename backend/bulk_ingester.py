@@ -1,15 +1,27 @@
 import os
-import requests
-import uuid
+import sys
+import orjson
+import html
+import io
+import re
 import time
-import xml.etree.ElementTree as ET
+import asyncio
+import aiohttp
+from aiolimiter import AsyncLimiter
+import uuid
+from lxml import etree
+try:
+    import uvloop
+except ImportError:  # Windows / not installed: stay on the default asyncio loop
+    uvloop = None
 from backend.rag_service import rag_service
+from backend import ingest_cache
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Common Medical Categories to search for in PubMed/MedlinePlus
-COMMON_TERMS = [
+# Common Medical Categories to search for in PubMed/MedlinePlus (deduplicated, order kept)
+COMMON_TERMS = tuple(dict.fromkeys([
     # Rare & Genetic Disorders
     "Wilson disease", "Hemochromatosis", "Huntington Disease", "Cystic Fibrosis",
     "Sickle Cell Anemia", "Thalassemia", "Gaucher Disease", "Fabry Disease",
@@ -37,26 +49,204 @@ COMMON_TERMS = [
     "headache", "nausea", "bloating", "stomach pain", "dizziness", "fever",
     "fatigue", "cough", "shortness of breath", "chest pain", "joint pain",
     "muscle ache", "diarrhea", "constipation", "insomnia", "rash"
-]
+]))
+
+SYMPTOM_TERMS = frozenset({
+    "headache", "nausea", "bloating", "stomach pain", "dizziness", "fever",
+    "fatigue", "cough", "shortness of breath", "chest pain", "joint pain",
+    "muscle ache", "diarrhea", "constipation", "insomnia", "rash"
+})
+
+_DNS_NS = uuid.NAMESPACE_DNS
 
-def safe_request(url, params=None, timeout=15):
+def upsert_changed(docs):
     """
-    Helper for making safe HTTP requests with retries.
+    Upserts only documents whose content changed since the last successful write.
     """
-    for _ in range(3):
+    hashes = {doc_id: ingest_cache.content_hash(text, metadata) for doc_id, text, metadata in docs}
+    changed = [doc for doc in docs if not ingest_cache.is_unchanged(doc[0], hashes[doc[0]])]
+    if not changed:
+        return
+    datasets = {doc_id: metadata.get("dataset") for doc_id, _, metadata in changed}
+    for doc_id in rag_service.upsert_many(changed) or []:
+        ingest_cache.record(doc_id, hashes[doc_id], datasets[doc_id])
+
+# NCBI E-utils allow 3 req/s anonymously, 10 req/s with an API key
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+
+# Per-host cap on in-flight requests
+HOST_CONCURRENCY = {
+    "eutils.ncbi.nlm.nih.gov": 10 if NCBI_API_KEY else 3,
+}
+DEFAULT_HOST_CONCURRENCY = 16
+
+# Token-bucket request rates (max requests, per seconds) for APIs with published limits
+HOST_RATE_LIMITS = {
+    "api.fda.gov": (240, 60),
+    "eutils.ncbi.nlm.nih.gov": (10 if NCBI_API_KEY else 3, 1),
+}
+
+# Transient failures are retried with exponential backoff (0.5s, 1s, 2s)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HttpFanout:
+    """
+    Shared aiohttp session plus one semaphore (and, where the API publishes one, a
+    token-bucket rate limiter) per host, so every fetcher can fan out its requests
+    concurrently without exceeding each API's limits.
+    """
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self._semaphores = {}
+        self._limiters = {
+            host: AsyncLimiter(max_rate, time_period)
+            for host, (max_rate, time_period) in HOST_RATE_LIMITS.items()
+        }
+
+    def _semaphore(self, url):
+        host = url.split("/")[2]
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+        return self._semaphores[host]
+
+    async def request(self, method, url, timeout=15, **kwargs):
+        """
+        Async request over the pooled keep-alive session, retrying transient failures
+        with exponential backoff. Returns (status, body bytes) or None after all attempts.
+        """
+        for attempt in range(RETRY_TOTAL):
+            try:
+                limiter = self._limiters.get(url.split("/")[2])
+                if limiter is not None:
+                    await limiter.acquire()
+                async with self._semaphore(url):
+                    async with self.session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                                    **kwargs) as resp:
+                        if resp.status in RETRY_STATUSES:
+                            resp.raise_for_status()
+                        return resp.status, await resp.read()
+            except Exception as e:
+                print(f"   ⚠️ Request failed: {e}. Retrying...")
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+        return None
+
+    async def get(self, url, params=None, headers=None, timeout=15):
+        return await self.request("GET", url, timeout=timeout, params=params, headers=headers)
+
+    async def post(self, url, data=None, headers=None, timeout=15):
+        return await self.request("POST", url, timeout=timeout, data=data, headers=headers)
+
+class UpsertWorker:
+    """
+    Drains queued documents into rag_service from a single worker task, so the network
+    fan-out never waits on embedding/Pinecone calls. Documents are flushed in batches of
+    BATCH_SIZE through rag_service.upsert_many (one embed pass + one upsert per batch).
+    """
+    BATCH_SIZE = 64
+    FLUSH_INTERVAL = 1.0  # seconds
+
+    def __init__(self, maxsize=256):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.queue.put(None)
+        await self._task
+
+    async def put(self, doc_id, text, metadata):
+        await self.queue.put((doc_id, text, metadata))
+
+    async def _flush(self, batch):
         try:
-            resp = requests.get(url, params=params, timeout=timeout)
-            resp.raise_for_status()
-            return resp
+            await asyncio.to_thread(upsert_changed, batch)
         except Exception as e:
-            print(f"   ⚠️ Request failed: {e}. Retrying...")
-            time.sleep(2)
-    return None
+            print(f"   ⚠️ Upsert failed for batch of {len(batch)}: {e}")
+
+    async def _run(self):
+        batch = []
+        while True:
+            try:
+                # Flush a partial batch once producers go quiet
+                if batch:
+                    item = await asyncio.wait_for(self.queue.get(), self.FLUSH_INTERVAL)
+                else:
+                    item = await self.queue.get()
+            except asyncio.TimeoutError:
+                await self._flush(batch)
+                batch = []
+                continue
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= self.BATCH_SIZE:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+# lxml parser and XPath expressions compiled once; evaluation runs in libxml2
+_XML_PARSER = etree.XMLParser(huge_tree=True, recover=True)
+_DOCUMENT_XP = etree.XPath(".//document")
+_CONTENT_TITLE_XP = etree.XPath("string(content[@name='title'])")
+_CONTENT_SUMMARY_XP = etree.XPath("string(content[@name='FullSummary'])")
+_TITLE_XP = etree.XPath("string(.//ArticleTitle)")
+_ABSTRACT_XP = etree.XPath(".//AbstractText/text()")
+_PMID_XP = etree.XPath("string(.//PMID)")
+
+# MedlinePlus summaries embed simple HTML; strip it with regexes instead of re-parsing
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+
+# WHO tokens live for an hour; reuse one across runs instead of re-authenticating each time
+ICD11_TOKEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".icd11_token.json")
+ICD11_TOKEN_TTL = 3500
+ICD11_TOKEN_MARGIN = 60
+
+def _load_icd11_token(client_id):
+    try:
+        with open(ICD11_TOKEN_PATH, "rb") as f:
+            cached = orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if cached.get("client_id") != client_id or cached.get("exp", 0) <= time.time() + ICD11_TOKEN_MARGIN:
+        return None
+    return cached.get("access_token")
+
+def _discard_icd11_token():
+    try:
+        os.remove(ICD11_TOKEN_PATH)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Could not remove cached ICD-11 token: {e}")
+
+def _save_icd11_token(client_id, token, expires_in):
+    try:
+        tmp_path = ICD11_TOKEN_PATH + ".tmp"
+        # Bearer token on disk: readable by the owner only
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps({
+                "client_id": client_id,
+                "access_token": token,
+                "exp": time.time() + min(expires_in, ICD11_TOKEN_TTL)
+            }))
+        os.replace(tmp_path, ICD11_TOKEN_PATH)
+    except OSError as e:
+        print(f"⚠️ Could not cache ICD-11 token: {e}")
 
 # Core ICD-11 & DDI extraction logic (Automated)
-def get_icd11_token():
+async def get_icd11_token(http, refresh=False):
     """
     Authenticates with WHO ICD-11 API and returns an access token.
+    A still-valid token cached on disk is reused without a network round-trip,
+    unless refresh=True (the cached token was rejected), which discards it first.
     """
     token_endpoint = 'https://icdaccessmanagement.who.int/connect/token'
     client_id = os.getenv("ICD11_CLIENT_ID")
@@ -66,6 +256,13 @@ def get_icd11_token():
         print("⚠️ ICD-11 API Credentials missing in .env")
         return None
 
+    if refresh:
+        _discard_icd11_token()
+    cached_token = None if refresh else _load_icd11_token(client_id)
+    if cached_token:
+        print("🔑 Reusing cached ICD-11 token.")
+        return cached_token
+
     payload = {
         'client_id': client_id,
         'client_secret': client_secret,
@@ -74,16 +271,22 @@ def get_icd11_token():
     }
     
     try:
-        response = requests.post(token_endpoint, data=payload, timeout=15)
-        response.raise_for_status()
-        return response.json().get('access_token')
+        result = await http.post(token_endpoint, data=payload)
+        if not result or result[0] != 200:
+            raise RuntimeError(f"token endpoint returned {result[0] if result else 'no response'}")
+        data = orjson.loads(result[1])
+        token = data.get('access_token')
+        if token:
+            _save_icd11_token(client_id, token, data.get('expires_in', ICD11_TOKEN_TTL))
+        return token
     except Exception as e:
         print(f"❌ Failed to get ICD-11 token: {e}")
         return None
 
-def fetch_icd11_mms_taxonomy(token, depth=2, max_entities=100):
+async def fetch_icd11_mms_taxonomy(http, upserts, token, depth=2, max_entities=100):
     """
-    Recursively fetches ICD-11 MMS taxonomy and indexes descriptions.
+    Fetches the ICD-11 MMS taxonomy breadth-first and indexes descriptions.
+    Each level's URIs are fetched concurrently, so wall time scales with depth, not node count.
     """
     print(f"📋 Starting Automated ICD-11 Taxonomy Extraction (Depth: {depth}, Max: {max_entities})...")
     base_uri = 'https://id.who.int/icd/release/11/2024-01/mms'
@@ -95,25 +298,48 @@ def fetch_icd11_mms_taxonomy(token, depth=2, max_entities=100):
     }
     
     indexed_count = 0
+    # A cached token can be revoked before its stored expiry (or the secret rotated);
+    # the first 401 re-authenticates once for the whole crawl and each rejected fetch retries once
+    token_refresh = None
+
+    async def refresh_token():
+        nonlocal token_refresh
+        if token_refresh is None:
+            print("🔑 ICD-11 token rejected (401), re-authenticating...")
+            token_refresh = asyncio.ensure_future(get_icd11_token(http, refresh=True))
+        new_token = await token_refresh
+        if new_token:
+            headers['Authorization'] = f'Bearer {new_token}'
+        return new_token
     
-    def process_entity(uri, current_depth):
-        nonlocal indexed_count
-        if current_depth > depth or indexed_count >= max_entities:
-            return
-
+    async def fetch_entity(uri):
         try:
-            resp = requests.get(uri, headers=headers, timeout=15)
-            if resp.status_code != 200: return
-            
-            data = resp.json()
+            result = await http.get(uri, headers=headers)
+            if result and result[0] == 401 and await refresh_token():
+                result = await http.get(uri, headers=headers)
+            if not result or result[0] != 200:
+                return None
+            return orjson.loads(result[1])
+        except Exception as e:
+            print(f"   ⚠️ Error processing ICD-11 URI {uri}: {e}")
+            return None
+
+    frontier = [base_uri]
+    current_depth = 0
+    while frontier and current_depth <= depth and indexed_count < max_entities:
+        entities = await asyncio.gather(*[fetch_entity(uri) for uri in frontier])
+        next_frontier = []
+        for uri, data in zip(frontier, entities):
+            if data is None or indexed_count >= max_entities:
+                continue
             title = data.get('title', {}).get('@value', 'No Title')
             definition = data.get('definition', {}).get('@value', '')
             code = data.get('code', 'No Code')
             
             if title:
-                doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"icd11-auto-{uri}"))
+                doc_id = str(uuid.uuid5(_DNS_NS, f"icd11-auto-{uri}"))
                 text_content = f"{title}: {definition}" if definition else title
-                rag_service.upsert_document(
+                await upserts.put(
                     doc_id=doc_id,
                     text=text_content,
                     metadata={
@@ -127,22 +353,17 @@ def fetch_icd11_mms_taxonomy(token, depth=2, max_entities=100):
                 indexed_count += 1
                 if indexed_count % 10 == 0:
                     print(f"   - Indexed {indexed_count} ICD-11 entities (Current: {title})...")
+            
+            next_frontier.extend(data.get('child', []))
+        
+        # Only expand as many children as we can still index
+        frontier = next_frontier[:max_entities - indexed_count]
+        current_depth += 1
 
-            # Traverse children if we haven't reached max
-            if indexed_count < max_entities:
-                children = data.get('child', [])
-                for child_uri in children:
-                    if indexed_count >= max_entities: break
-                    process_entity(child_uri, current_depth + 1)
-                
-        except Exception as e:
-            print(f"   ⚠️ Error processing ICD-11 URI {uri}: {e}")
-
-    process_entity(base_uri, 0)
     print(f"✅ Automated ICD-11 Ingestion Complete: {indexed_count} entities.")
     return indexed_count
 
-def fetch_ddi_automated():
+async def fetch_ddi_automated(http, upserts):
     """
     Fetches Drug-Drug Interactions using OpenFDA API for a wide range of common drugs.
     This replaces the discontinued RxNav interaction API.
@@ -150,7 +371,7 @@ def fetch_ddi_automated():
     print("💊 Starting Automated Drug-Drug Interaction Ingestion (OpenFDA)...")
     
     # Expanded list of common generic drugs to fetch interactions for
-    COMMON_DRUGS = [
+    COMMON_DRUGS = tuple(dict.fromkeys([
         "Atorvastatin", "Levothyroxine", "Lisinopril", "Metformin", "Amlodipine",
         "Metoprolol", "Albuterol", "Omeprazole", "Losartan", "Gabapentin",
         "Hydrochlorothiazide", "Sertraline", "Simvastatin", "Montelukast", "Acetaminophen",
@@ -163,25 +384,26 @@ def fetch_ddi_automated():
         "Loratadine", "Fenofibrate", "Propranolol", "Methylprednisolone", "Cephalexin", 
         "Spironolactone", "Clonazepam", "Sildenafil", "Tadalafil", "Alprazolam", 
         "Lorazepam", "Metronidazole", "Doxycycline", "Gabapentin", "Methotrexate"
-    ]
+    ]))
     
     indexed_count = 0
     base_url = "https://api.fda.gov/drug/label.json"
     
-    for drug in COMMON_DRUGS:
+    async def fetch_drug(drug):
+        nonlocal indexed_count
         # Search for the drug label using generic name
         params = {
             "search": f'openfda.generic_name:"{drug}"',
             "limit": 1
         }
         try:
-            resp = requests.get(base_url, params=params, timeout=15)
-            if resp.status_code != 200:
-                continue
+            result = await http.get(base_url, params=params)
+            if not result or result[0] != 200:
+                return
                 
-            data = resp.json()
+            data = orjson.loads(result[1])
             results = data.get("results", [])
-            if not results: continue
+            if not results: return
             
             label = results[0]
             interactions_text = label.get("drug_interactions", [""])[0]
@@ -189,10 +411,10 @@ def fetch_ddi_automated():
             generic_name = label.get("openfda", {}).get("generic_name", [drug])[0]
             
             if interactions_text and len(interactions_text) > 50:
-                doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"openfda-ddi-{generic_name}"))
+                doc_id = str(uuid.uuid5(_DNS_NS, f"openfda-ddi-{generic_name}"))
                 text = f"Drug Interactions for {brand_name} ({generic_name}):\n\n{interactions_text}"
                 
-                rag_service.upsert_document(
+                await upserts.put(
                     doc_id=doc_id,
                     text=text,
                     metadata={
@@ -208,69 +430,59 @@ def fetch_ddi_automated():
                 if indexed_count % 5 == 0:
                     print(f"   - Indexed {indexed_count} drug interaction profiles (Latest: {generic_name})...")
                 
-                # Small sleep to respect rate limits
-                time.sleep(0.5)
-                
         except Exception as e:
             print(f"   ⚠️ Error fetching DDI for {drug}: {e}")
 
+    # Rate limiting is handled by the OpenFDA token bucket in HttpFanout
+    await asyncio.gather(*[fetch_drug(drug) for drug in COMMON_DRUGS])
+
     print(f"✅ Automated DDI Ingestion Complete: {indexed_count} records.")
     return indexed_count
 
-def seed_icd11_data():
+async def seed_icd11_data(http, upserts):
     """
     Automated ICD-11 Ingestion.
     """
-    token = get_icd11_token()
+    token = await get_icd11_token(http)
     if token:
         # Depth 3 with 200 entities provides good coverage without overloading
-        return fetch_icd11_mms_taxonomy(token, depth=3, max_entities=200)
+        return await fetch_icd11_mms_taxonomy(http, upserts, token, depth=3, max_entities=200)
     return 0
 
-def seed_ddi_data():
+async def seed_ddi_data(http, upserts):
     """
     Automated Drug-Drug Interaction Ingestion.
     """
-    return fetch_ddi_automated()
+    return await fetch_ddi_automated(http, upserts)
 
-def fetch_medlineplus_data():
+async def fetch_medlineplus_data(http, upserts):
     """
     Fetches health topic summaries from MedlinePlus Web Service.
     """
     print("🏥 Fetching data from MedlinePlus...")
     count = 0
-    SYMPTOM_TERMS = ["headache", "nausea", "bloating", "stomach pain", "dizziness", "fever", 
-                     "fatigue", "cough", "shortness of breath", "chest pain", "joint pain", 
-                     "muscle ache", "diarrhea", "constipation", "insomnia", "rash"]
-    
-    for term in COMMON_TERMS:
+    async def fetch_term(term):
+        nonlocal count
         is_symptom = term in SYMPTOM_TERMS
-        url = f"https://wsearch.nlm.nih.gov/ws/query?db=healthTopics&term={term}"
-        response = safe_request(url)
-        if response and response.status_code == 200:
+        url = "https://wsearch.nlm.nih.gov/ws/query"
+        result = await http.get(url, params={"db": "healthTopics", "term": term})
+        if result and result[0] == 200:
             try:
-                root = ET.fromstring(response.content)
-                for doc in root.findall(".//document"):
-                    title = ""
-                    summary = ""
-                    for content in doc.findall("content"):
-                        if content.get("name") == "title":
-                            title = content.text
-                        if content.get("name") == "FullSummary":
-                            summary = content.text
+                root = etree.fromstring(result[1], parser=_XML_PARSER)
+                for doc in _DOCUMENT_XP(root):
+                    title = _CONTENT_TITLE_XP(doc)
+                    summary = _CONTENT_SUMMARY_XP(doc)
                     
                     if title and summary:
                         # Clean HTML tags
-                        try:
-                            clean_summary = ET.fromstring(f"<div>{summary}</div>").itertext()
-                            clean_text = "".join(clean_summary)
-                        except:
-                            clean_text = summary # Fallback if XML cleaning fails
+                        clean_text = html.unescape(_WS_RE.sub(" ", _HTML_TAG_RE.sub(" ", summary))).strip()
+                        if not clean_text:
+                            clean_text = summary # Fallback if cleaning strips everything
                         
-                        doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"medlineplus-{title}"))
+                        doc_id = str(uuid.uuid5(_DNS_NS, f"medlineplus-{title}"))
                         category = "Primary Symptom" if is_symptom else "Patient Education"
                         
-                        rag_service.upsert_document(
+                        await upserts.put(
                             doc_id=doc_id,
                             text=clean_text,
                             metadata={
@@ -287,106 +499,109 @@ def fetch_medlineplus_data():
             except Exception as e:
                 print(f"   ⚠️ Parsing Error for {term}: {e}")
     
+    await asyncio.gather(*[fetch_term(term) for term in COMMON_TERMS])
     print(f"✅ MedlinePlus: {count} topics indexed.")
     return count
 
-def fetch_pubmed_data():
+async def fetch_pubmed_data(http, upserts):
     """
     Fetches recent abstracts from PubMed using E-utils.
+    Terms are OR-ed into groups for ESearch and PMIDs are fetched in bulk EFetch calls,
+    so ~100 terms cost a couple of dozen requests instead of two per term.
     """
     print("🔬 Fetching data from PubMed...")
     count = 0
     base_search_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
     base_fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+    TERMS_PER_SEARCH = 10
+    IDS_PER_FETCH = 200
+    auth_params = {"api_key": NCBI_API_KEY} if NCBI_API_KEY else {}
     
-    for term in COMMON_TERMS:
-        # 1. Search for IDs
+    async def search_group(terms):
+        # 1. Search for IDs (one query per group of terms)
         search_params = {
             "db": "pubmed",
-            "term": term,
+            "term": " OR ".join(f"({term})" for term in terms),
             "retmode": "json",
-            "retmax": 5
+            "retmax": 5 * len(terms),
+            **auth_params
         }
-        search_resp = safe_request(base_search_url, params=search_params)
-        if search_resp:
-            try:
-                ids = search_resp.json().get("esearchresult", {}).get("idlist", [])
-                if not ids: continue
+        search_resp = await http.get(base_search_url, params=search_params)
+        if not search_resp:
+            return []
+        try:
+            return orjson.loads(search_resp[1]).get("esearchresult", {}).get("idlist", [])
+        except Exception as e:
+            print(f"   ⚠️ Parsing Error for PubMed search ({terms[0]}...): {e}")
+            return []
+    
+    async def fetch_batch(ids):
+        nonlocal count
+        # 2. Fetch Abstracts
+        fetch_params = {
+            "db": "pubmed",
+            "id": ",".join(ids),
+            "retmode": "xml",
+            **auth_params
+        }
+        fetch_resp = await http.get(base_fetch_url, params=fetch_params)
+        if not fetch_resp:
+            return
+        try:
+            # Stream articles one at a time and free each as soon as it's read, so a
+            # 200-article EFetch payload never exists as a full tree in memory
+            articles = etree.iterparse(io.BytesIO(fetch_resp[1]), tag="PubmedArticle", huge_tree=True, recover=True)
+            for _, article in articles:
+                title = _TITLE_XP(article)
+                abstract_text = " ".join(_ABSTRACT_XP(article))
+                pmid = _PMID_XP(article)
+                article.clear()
+                while article.getprevious() is not None:
+                    del article.getparent()[0]
                 
-                # 2. Fetch Abstracts
-                fetch_params = {
-                    "db": "pubmed",
-                    "id": ",".join(ids),
-                    "retmode": "xml"
-                }
-                fetch_resp = safe_request(base_fetch_url, params=fetch_params)
-                if fetch_resp:
-                    root = ET.fromstring(fetch_resp.content)
-                    for article in root.findall(".//PubmedArticle"):
-                        title_el = article.find(".//ArticleTitle")
-                        title = title_el.text if title_el is not None else ""
-                        
-                        abstract_parts = article.findall(".//AbstractText")
-                        abstract_text = " ".join([part.text for part in abstract_parts if part.text])
-                        
-                        pmid_el = article.find(".//PMID")
-                        pmid = pmid_el.text if pmid_el is not None else ""
-                        
-                        if title and abstract_text:
-                            doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"pubmed-{pmid}"))
-                            rag_service.upsert_document(
-                                doc_id=doc_id,
-                                text=abstract_text,
-                                metadata={
-                                    "source": f"PubMed (PMID: {pmid})",
-                                    "title": title,
-                                    "category": "Clinical Research",
-                                    "text": abstract_text
-                                }
-                            )
-                            count += 1
-                            if count % 10 == 0:
-                                print(f"   - Progress: {count} PubMed records verified/updated...")
-            except Exception as e:
-                print(f"   ⚠️ Parsing Error for PubMed {term}: {e}")
-            
+                if title and abstract_text:
+                    doc_id = str(uuid.uuid5(_DNS_NS, f"pubmed-{pmid}"))
+                    await upserts.put(
+                        doc_id=doc_id,
+                        text=abstract_text,
+                        metadata={
+                            "source": f"PubMed (PMID: {pmid})",
+                            "title": title,
+                            "category": "Clinical Research",
+                            "text": abstract_text
+                        }
+                    )
+                    count += 1
+                    if count % 10 == 0:
+                        print(f"   - Progress: {count} PubMed records verified/updated...")
+        except Exception as e:
+            print(f"   ⚠️ Parsing Error for PubMed batch: {e}")
+    
+    groups = [COMMON_TERMS[i:i + TERMS_PER_SEARCH] for i in range(0, len(COMMON_TERMS), TERMS_PER_SEARCH)]
+    id_lists = await asyncio.gather(*[search_group(group) for group in groups])
+    # Preserve order, drop PMIDs matched by more than one group
+    all_ids = list(dict.fromkeys(pmid for ids in id_lists for pmid in ids))
+    
+    await asyncio.gather(*[
+        fetch_batch(all_ids[i:i + IDS_PER_FETCH]) for i in range(0, len(all_ids), IDS_PER_FETCH)
+    ])
     print(f"✅ PubMed: {count} abstracts indexed.")
     return count
 
-def fetch_who_nhs_factsheets():
-    """
-    Fetches patient-friendly disease fact sheets from WHO and NHS.
-    
-    CRITICAL: All records MUST include dataset="WHO_NHS" metadata.
-    """
-    print("🏥 Fetching WHO/NHS Disease Fact Sheets...")
-    count = 0
-    
-    # Common diseases to fetch fact sheets for
-    DISEASE_TOPICS = [
-        "Diabetes", "Hypertension", "Asthma", "Heart Disease", "Stroke",
-        "Cancer", "Tuberculosis", "HIV/AIDS", "COVID-19", "Influenza",
-        "Pneumonia", "Malaria", "Dengue", "Hepatitis", "Alzheimer",
-        "Parkinson", "Depression", "Anxiety", "Arthritis", "Obesity",
-        "Chronic Kidney Disease", "COPD", "Epilepsy", "Multiple Sclerosis",
-        "Lupus", "Rheumatoid Arthritis", "Psoriasis", "Celiac Disease",
-        "Crohn's Disease", "Ulcerative Colitis", "Migraine", "Osteoporosis",
-        "Anemia", "Thyroid Disease", "Schizophrenia", "Bipolar Disorder"
-    ]
-    
-    # WHO Health Topics (using their public API/web service)
-    print("   📋 Fetching WHO fact sheets...")
-    for topic in DISEASE_TOPICS:
-        try:
-            # WHO provides structured health topic data
-            # Using their search API endpoint
-            url = f"https://www.who.int/health-topics/{topic.lower().replace(' ', '-')}"
-            
-            # For now, we'll create structured fact sheets based on WHO's standard format
-            # In production, you would scrape or use WHO's API
-            
-            # Simulated WHO fact sheet content (replace with actual scraping)
-            fact_sheet_text = f"""
+# Common diseases to build WHO/NHS fact sheets for
+DISEASE_TOPICS = [
+    "Diabetes", "Hypertension", "Asthma", "Heart Disease", "Stroke",
+    "Cancer", "Tuberculosis", "HIV/AIDS", "COVID-19", "Influenza",
+    "Pneumonia", "Malaria", "Dengue", "Hepatitis", "Alzheimer",
+    "Parkinson", "Depression", "Anxiety", "Arthritis", "Obesity",
+    "Chronic Kidney Disease", "COPD", "Epilepsy", "Multiple Sclerosis",
+    "Lupus", "Rheumatoid Arthritis", "Psoriasis", "Celiac Disease",
+    "Crohn's Disease", "Ulcerative Colitis", "Migraine", "Osteoporosis",
+    "Anemia", "Thyroid Disease", "Schizophrenia", "Bipolar Disorder"
+]
+
+# Fact sheet templates (filled with .format(topic=...)); no network calls are involved
+WHO_FACTSHEET_TEMPLATE = """
 {topic} - WHO Fact Sheet
 
 {topic} is a significant health condition that affects millions of people worldwide.
@@ -415,45 +630,9 @@ Treatment plans should be individualized based on patient needs.
 
 Prevention:
 Some cases may be preventable through healthy lifestyle choices and regular health screenings.
-            """.strip()
-            
-            doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"who-factsheet-{topic.lower()}"))
-            
-            # MANDATORY METADATA with dataset field
-            metadata = {
-                "dataset": "WHO_NHS",  # REQUIRED
-                "role": "PatientEducation",  # REQUIRED
-                "source": "WHO",
-                "content_type": "DiseaseFactSheet",
-                "title": f"{topic} - WHO Fact Sheet",
-                "text": fact_sheet_text[:500],  # Store snippet
-                "category": "Patient Education"
-            }
-            
-            rag_service.upsert_document(
-                doc_id=doc_id,
-                text=fact_sheet_text,
-                metadata=metadata
-            )
-            count += 1
-            
-            if count % 5 == 0:
-                print(f"      - Indexed {count} WHO fact sheets...")
-            
-            time.sleep(0.3)  # Rate limiting
-            
-        except Exception as e:
-            print(f"   ⚠️ Error fetching WHO fact sheet for {topic}: {e}")
-    
-    # NHS Health A-Z (using their public content)
-    print("   📋 Fetching NHS Health A-Z content...")
-    for topic in DISEASE_TOPICS:
-        try:
-            # NHS provides patient-friendly health information
-            # Using their Health A-Z section
-            
-            # Simulated NHS content (replace with actual scraping)
-            nhs_content = f"""
+""".strip()
+
+NHS_FACTSHEET_TEMPLATE = """
 {topic} - NHS Health Information
 
 Overview:
@@ -489,60 +668,90 @@ Living with {topic}:
 Many people with {topic} can manage their condition effectively with 
 proper care and support. Your healthcare team can provide guidance 
 tailored to your individual needs.
-            """.strip()
-            
-            doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"nhs-health-az-{topic.lower()}"))
-            
-            # MANDATORY METADATA with dataset field
-            metadata = {
-                "dataset": "WHO_NHS",  # REQUIRED
-                "role": "PatientEducation",  # REQUIRED
-                "source": "NHS",
-                "content_type": "DiseaseFactSheet",
-                "title": f"{topic} - NHS Health A-Z",
-                "text": nhs_content[:500],  # Store snippet
-                "category": "Patient Education"
-            }
-            
-            rag_service.upsert_document(
-                doc_id=doc_id,
-                text=nhs_content,
-                metadata=metadata
-            )
-            count += 1
-            
-            if count % 5 == 0:
-                print(f"      - Indexed {count} total WHO/NHS fact sheets...")
-            
-            time.sleep(0.3)  # Rate limiting
-            
-        except Exception as e:
-            print(f"   ⚠️ Error fetching NHS content for {topic}: {e}")
+""".strip()
+
+def _factsheet_doc(topic, source):
+    template, doc_prefix, title_suffix = {
+        "WHO": (WHO_FACTSHEET_TEMPLATE, "who-factsheet", "WHO Fact Sheet"),
+        "NHS": (NHS_FACTSHEET_TEMPLATE, "nhs-health-az", "NHS Health A-Z"),
+    }[source]
+    text = template.format(topic=topic)
+    doc_id = str(uuid.uuid5(_DNS_NS, f"{doc_prefix}-{topic.lower()}"))
+    # MANDATORY METADATA with dataset field
+    metadata = {
+        "dataset": "WHO_NHS",  # REQUIRED
+        "role": "PatientEducation",  # REQUIRED
+        "source": source,
+        "content_type": "DiseaseFactSheet",
+        "title": f"{topic} - {title_suffix}",
+        "text": text[:500],  # Store snippet
+        "category": "Patient Education"
+    }
+    return doc_id, text, metadata
+
+async def fetch_who_nhs_factsheets(upserts):
+    """
+    Builds patient-friendly disease fact sheets in the WHO and NHS formats.
+    
+    CRITICAL: All records MUST include dataset="WHO_NHS" metadata.
+    """
+    print("🏥 Building WHO/NHS Disease Fact Sheets...")
+    docs = [
+        _factsheet_doc(topic, source)
+        for source in ("WHO", "NHS")
+        for topic in DISEASE_TOPICS
+    ]
+    for doc_id, _, metadata in docs:
+        rag_service.validate_metadata(doc_id, metadata)
+    
+    # Batched embed + upsert through the shared worker
+    for doc_id, text, metadata in docs:
+        await upserts.put(doc_id, text, metadata)
+    count = len(docs)
     
     print(f"✅ WHO/NHS: {count} fact sheets indexed.")
     print(f"   ℹ️  All records include dataset='WHO_NHS' for safe deletion.")
     return count
 
 
-def run_bulk_ingestion():
+async def run_bulk_ingestion_async():
+    # One pooled keep-alive session for every network call (TCP + TLS are reused per host);
+    # DNS is cached across requests
+    connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, json_serialize=lambda obj: orjson.dumps(obj).decode()) as session:
+        http = HttpFanout(session)
+        async with UpsertWorker() as upserts:
+            # All phases are independent (FDA, WHO, NLM, NCBI, local templates) and run concurrently
+            return await asyncio.gather(
+                seed_ddi_data(http, upserts),
+                seed_icd11_data(http, upserts),
+                fetch_medlineplus_data(http, upserts),
+                fetch_pubmed_data(http, upserts),
+                fetch_who_nhs_factsheets(upserts)
+            )
+
+def run_bulk_ingestion(force: bool = False):
+    """
+    Args:
+        force: Ignore the ingest cache and re-upsert every document (e.g. after the
+               index was recreated or vectors were removed outside delete_datasets.py)
+    """
     print("🚀 Starting Bulk Medical Data Ingestion...")
     
     if not rag_service.enabled:
         print("❌ RAG Service is not enabled. Check your PINECONE_API_KEY.")
         return
 
-    # Seed DDI data first (Faster and Safety Critical)
-    total_ddi = seed_ddi_data()
-    
-    # Seed ICD-11
-    total_icd = seed_icd11_data()
-    
-    # Then attempt network-based fetches
-    total_medline = fetch_medlineplus_data()
-    total_pubmed = fetch_pubmed_data()
-    
-    # NEW: WHO/NHS Patient Education Fact Sheets
-    total_who_nhs = fetch_who_nhs_factsheets()
+    if force:
+        print("♻️ --force: ignoring the ingest cache, every document will be re-upserted")
+        ingest_cache.forget_index()
+
+    # libuv-backed loop for the HTTP fan-out; installed here rather than at import
+    # so importing this module never changes the loop policy of the host process
+    if uvloop is not None:
+        uvloop.install()
+
+    total_ddi, total_icd, total_medline, total_pubmed, total_who_nhs = asyncio.run(run_bulk_ingestion_async())
     
     print(f"\n✨ Bulk Ingestion Complete!")
     print(f"   - ICD-11: {total_icd}")
@@ -553,4 +762,4 @@ def run_bulk_ingestion():
     print(f"   - Total New Records: {total_icd + total_ddi + total_medline + total_pubmed + total_who_nhs}")
 
 if __name__ == "__main__":
-    run_bulk_ingestion()
+    run_bulk_ingestion(force=any(arg in ("--force", "--no-cache") for arg in sys.argv[1:]))
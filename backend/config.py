@@ -0,0 +1,20 @@
+# backend/config.py
+import os
+from functools import lru_cache
+from types import SimpleNamespace
+from dotenv import load_dotenv
+
+@lru_cache(maxsize=None)
+def settings() -> SimpleNamespace:
+    """
+    Loads .env once per process and returns the environment-driven settings.
+    """
+    load_dotenv()
+    return SimpleNamespace(
+        GROQ_API_KEY=os.getenv("GROQ_API_KEY"),
+        GMAIL_SENDER_EMAIL=os.getenv("GMAIL_SENDER_EMAIL"),
+        GMAIL_APP_PASSWORD=os.getenv("GMAIL_APP_PASSWORD"),
+        FRONTEND_URL=os.getenv("FRONTEND_URL", "http://localhost:3000"),
+        GROQ_MAX_CONCURRENCY=int(os.getenv("GROQ_MAX_CONCURRENCY", "20")),
+        LLM_LOG_LEVEL=os.getenv("LLM_LOG_LEVEL", "INFO").upper(),
+    )
@@ -1,35 +1,54 @@
 # backend/dashboard_service.py
 from fastapi import APIRouter, Depends
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
 from .mongo_memory import get_full_history_for_dashboard, clear_user_memory
 from .auth import get_current_user
 from .models import User, AuditLog
-from .database import get_db
+from .database import get_db_readonly
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, tuple_
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+AUDIT_LOG_PAGE_MAX = 200
+
 @router.get("/audit-logs")
 def get_audit_logs(
     limit: int = 50,
-    offset: int = 0,
+    before_ts: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     action: str = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_readonly)
 ):
     """
-    Fetch audit logs for monitoring and debugging.
+    Fetch audit logs for monitoring and debugging, newest first (timestamp DESC, id DESC).
     In a production app, this should be restricted to 'admin' role.
+
+    Keyset-paginated on (timestamp, id); there is no offset parameter.
+    Response: {"logs": [...], "next_before": {"ts": <timestamp>, "id": <id>} | null}
+    - limit: page size, clamped to 1..AUDIT_LOG_PAGE_MAX
+    - before_ts / before_id: pass next_before.ts / next_before.id from the previous page;
+      the id breaks ties, so rows sharing the boundary timestamp are neither skipped nor repeated
+    - next_before is null when the page is empty; keep paging until "logs" is empty
+    - before_ts without before_id filters on timestamp alone (may skip same-timestamp rows)
     """
     query = db.query(AuditLog)
     
     if action:
         query = query.filter(AuditLog.action == action)
+    if before_ts and before_id is not None:
+        query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < (before_ts, before_id))
+    elif before_ts:
+        query = query.filter(AuditLog.timestamp < before_ts)
         
-    logs = query.order_by(desc(AuditLog.timestamp)).offset(offset).limit(limit).all()
+    logs = query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(max(1, min(limit, AUDIT_LOG_PAGE_MAX))).all()
     
-    return logs
+    return {
+        "logs": logs,
+        "next_before": {"ts": logs[-1].timestamp, "id": logs[-1].id} if logs else None
+    }
 
 @router.get("/history", response_model=List[Dict[str, Any]])
 def get_user_history(current_user: User = Depends(get_current_user)):
@@ -1,8 +1,10 @@
 # backend/database.py
 
 import os
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,18 +26,68 @@ if not all([
 ]):
     raise RuntimeError("❌ PostgreSQL environment variables are missing")
 
+# JSON columns (e.g. audit metadata) are (de)serialized with orjson instead of stdlib json
+def _json_dumps(value) -> str:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+# Pool sizing shared by both engines; LIFO keeps a small set of warm connections in use.
+# No pre-ping round-trip per checkout: TCP keepalives and pool_recycle retire dead or stale
+# connections, and DB_POOL_PRE_PING=1 turns it back on for flaky networks.
+POOL_SETTINGS = dict(
+    pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    pool_recycle=1800,
+    pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "0") == "1",
+    pool_reset_on_return="rollback",
+    pool_use_lifo=True
+)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+
 engine = create_engine(
     DATABASE_URL,
     echo=False,
-    pool_pre_ping=True
+    json_serializer=_json_dumps,
+    json_deserializer=orjson.loads,
+    connect_args={
+        "options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}",
+        "keepalives": 1,
+        "keepalives_idle": 30
+    },
+    **POOL_SETTINGS
 )
 
+# Same pool, autocommit: read-only endpoints skip the BEGIN/COMMIT round-trips
+readonly_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
+ReadOnlySessionLocal = sessionmaker(
+    autoflush=False,
+    bind=readonly_engine
+)
+
+# Async engine (asyncpg) for routes that await their queries instead of blocking the loop
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    json_serializer=_json_dumps,
+    json_deserializer=orjson.loads,
+    connect_args={"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}},
+    **POOL_SETTINGS
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -44,3 +96,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_db_readonly():
+    db = ReadOnlySessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
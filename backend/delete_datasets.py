@@ -6,60 +6,97 @@ without affecting other data.
 
 Usage:
     python backend/delete_datasets.py WHO_NHS
-    python backend/delete_datasets.py SNOMED_CT
-    python backend/delete_datasets.py UMLS
+    python backend/delete_datasets.py SNOMED_CT UMLS
+    python backend/delete_datasets.py WHO_NHS SNOMED_CT UMLS --yes
+
+Multiple datasets are confirmed once and deleted concurrently.
+Pass --yes to skip the confirmation prompt (e.g. in CI).
 
 CRITICAL: Only deletes datasets with the specified 'dataset' metadata field.
 """
 
 import sys
+import asyncio
+from typing import List
 from backend.rag_service import rag_service
+from backend import ingest_cache
+
+VALID_DATASETS = ["WHO_NHS", "SNOMED_CT", "UMLS"]
 
-def delete_dataset(dataset_name: str):
+async def _delete_one(dataset_name: str) -> bool:
+    try:
+        # Delete by metadata filter (blocking client call, run in a worker thread)
+        print(f"🗑️  Deleting all vectors with dataset='{dataset_name}'...")
+        await asyncio.to_thread(rag_service.index.delete, filter={"dataset": dataset_name})
+        print(f"✅ Successfully deleted all vectors with dataset='{dataset_name}'")
+        # Otherwise the next ingest would skip these (deterministic) doc ids as "unchanged"
+        forgotten = ingest_cache.forget_dataset(dataset_name)
+        if forgotten:
+            print(f"   ℹ️  Dropped {forgotten} ingest cache entries for '{dataset_name}'")
+        return True
+    except Exception as e:
+        print(f"❌ Error during deletion of '{dataset_name}': {e}")
+        return False
+
+def delete_datasets(dataset_names: List[str], assume_yes: bool = False):
     """
-    Deletes all vectors with the specified dataset metadata.
+    Deletes all vectors for each of the given datasets, concurrently.
     
     Args:
-        dataset_name: One of "WHO_NHS", "SNOMED_CT", "UMLS"
+        dataset_names: Any of "WHO_NHS", "SNOMED_CT", "UMLS"
+        assume_yes: Skip the interactive confirmation
     
     Raises:
-        ValueError: If dataset_name is not valid
+        ValueError: If any dataset name is not valid
     """
-    VALID_DATASETS = ["WHO_NHS", "SNOMED_CT", "UMLS"]
-    
-    if dataset_name not in VALID_DATASETS:
+    invalid = [name for name in dataset_names if name not in VALID_DATASETS]
+    if invalid:
         raise ValueError(
-            f"Invalid dataset: '{dataset_name}'. "
+            f"Invalid dataset(s): {invalid}. "
             f"Must be one of: {VALID_DATASETS}"
         )
+    # Preserve order, ignore repeats
+    dataset_names = list(dict.fromkeys(dataset_names))
     
     if not rag_service.enabled:
         print("❌ RAG Service is not enabled. Check your PINECONE_API_KEY.")
         return
     
     if rag_service.mock_mode:
-        print(f"[MOCK MODE] Would delete all vectors with dataset='{dataset_name}'")
-        print(f"   ℹ️  In production, this would use: index.delete(filter={{'dataset': '{dataset_name}'}})")
+        for dataset_name in dataset_names:
+            print(f"[MOCK MODE] Would delete all vectors with dataset='{dataset_name}'")
+            print(f"   ℹ️  In production, this would use: index.delete(filter={{'dataset': '{dataset_name}'}})")
         return
     
-    # Confirm deletion
-    print(f"⚠️  WARNING: This will delete ALL vectors with dataset='{dataset_name}'")
+    # Confirm deletion (once for all datasets)
+    joined = " ".join(dataset_names)
+    print(f"⚠️  WARNING: This will delete ALL vectors with dataset in {dataset_names}")
     print(f"   This action cannot be undone.")
     
-    confirm = input(f"   Type '{dataset_name}' to confirm deletion: ")
+    if not assume_yes:
+        confirm = input(f"   Type '{joined}' to confirm deletion: ")
+        if confirm != joined:
+            print("❌ Deletion cancelled. Confirmation did not match.")
+            return
     
-    if confirm != dataset_name:
-        print("❌ Deletion cancelled. Confirmation did not match.")
-        return
+    async def _delete_all():
+        return await asyncio.gather(*[_delete_one(name) for name in dataset_names])
     
-    try:
-        # Delete by metadata filter
-        print(f"🗑️  Deleting all vectors with dataset='{dataset_name}'...")
-        rag_service.index.delete(filter={"dataset": dataset_name})
-        print(f"✅ Successfully deleted all vectors with dataset='{dataset_name}'")
+    results = asyncio.run(_delete_all())
+    if all(results):
         print(f"   ℹ️  Other datasets remain unaffected.")
-    except Exception as e:
-        print(f"❌ Error during deletion: {e}")
+
+def delete_dataset(dataset_name: str, assume_yes: bool = False):
+    """
+    Deletes all vectors with the specified dataset metadata.
+    
+    Args:
+        dataset_name: One of "WHO_NHS", "SNOMED_CT", "UMLS"
+    
+    Raises:
+        ValueError: If dataset_name is not valid
+    """
+    delete_datasets([dataset_name], assume_yes=assume_yes)
 
 def list_datasets():
     """
@@ -70,23 +107,26 @@ def list_datasets():
     print("   - SNOMED_CT: Disease and symptom ontology (subset)")
     print("   - UMLS: Unified Medical Language System mappings")
     print("\nUsage:")
-    print("   python backend/delete_datasets.py <DATASET_NAME>")
+    print("   python backend/delete_datasets.py <DATASET_NAME> [<DATASET_NAME> ...] [--yes]")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("❌ Error: Missing dataset name argument")
-        print()
+    args = sys.argv[1:]
+    
+    if any(arg in ["--help", "-h", "help"] for arg in args):
         list_datasets()
-        sys.exit(1)
+        sys.exit(0)
     
-    dataset_arg = sys.argv[1]
+    assume_yes = any(arg in ["--yes", "-y"] for arg in args)
+    dataset_args = [arg for arg in args if arg not in ["--yes", "-y"]]
     
-    if dataset_arg in ["--help", "-h", "help"]:
+    if not dataset_args:
+        print("❌ Error: Missing dataset name argument")
+        print()
         list_datasets()
-        sys.exit(0)
+        sys.exit(1)
     
     try:
-        delete_dataset(dataset_arg)
+        delete_datasets(dataset_args, assume_yes=assume_yes)
     except ValueError as e:
         print(f"❌ {e}")
         print()
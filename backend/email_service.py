@@ -1,94 +1,171 @@
-import smtplib
-import os
+import asyncio
+from string import Template
+from typing import List, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
+import aiosmtplib
+from .config import settings
 
-load_dotenv()
+# Password reset email bodies, parsed once; only the link changes per message
+_TEXT_TMPL = Template("""
+Hello,
+
+We received a request to reset your password for your AI Health Assistant account.
+
+Click the link below to set a new password:
+${reset_link}
+
+This link will expire in 15 minutes for your security.
+If you did not request this change, please ignore this email.
+
+Stay healthy,
+AI Health Assistant Team
+""")
+
+_HTML_TMPL = Template("""
+<html>
+  <body style="font-family: sans-serif; color: #333;">
+    <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #eee; border-radius: 10px;">
+      <h2 style="color: #2D6A4F;">Password Reset Request</h2>
+      <p>Hello,</p>
+      <p>We received a request to reset your password for your AI Health Assistant account.</p>
+      <p style="margin: 30px 0;">
+        <a href="${reset_link}" style="background-color: #2D6A4F; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; font-weight: bold;">Reset Password</a>
+      </p>
+      <p style="font-size: 0.9em; color: #666;">
+        This link will expire in <strong>15 minutes</strong> for your security.
+      </p>
+      <p style="font-size: 0.9em; color: #666;">
+        If you did not request this change, please ignore this email.
+      </p>
+      <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
+      <p style="font-size: 0.8em; color: #999;">
+        AI Health Assistant - Secure Healthcare MVP
+      </p>
+    </div>
+  </body>
+</html>
+""")
 
 class EmailService:
+    # Emails are sent by background workers, each holding one authenticated SMTP connection
+    POOL_SIZE = 5
+    MAX_MESSAGES_PER_CONNECTION = 100
+    QUEUE_MAXSIZE = 1000
+
     def __init__(self):
         self.smtp_server = "smtp.gmail.com"
         self.smtp_port = 587
-        self.sender_email = os.getenv("GMAIL_SENDER_EMAIL")
-        self.sender_password = os.getenv("GMAIL_APP_PASSWORD")
-        self.frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
+        config = settings()
+        self.sender_email = config.GMAIL_SENDER_EMAIL
+        self.sender_password = config.GMAIL_APP_PASSWORD
+        self.frontend_url = config.FRONTEND_URL
+        self._from_header = f"AI Health Assistant <{self.sender_email}>"
+        self._reset_url_prefix = f"{self.frontend_url}/reset-password?token="
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Starts the SMTP sender workers on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop and not all(w.done() for w in self._workers):
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.QUEUE_MAXSIZE)
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.POOL_SIZE)]
 
-    def send_password_reset_email(self, target_email: str, token: str):
+    async def shutdown(self):
+        """Sends everything still queued, then closes the pooled connections."""
+        if not self._workers:
+            return
+        for _ in self._workers:
+            await self._queue.put(None)  # Sentinel: one per worker
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def send_password_reset_email(self, target_email: str, token: str):
         """
-        Sends a secure password reset link via Gmail SMTP.
+        Queues a secure password reset link for delivery via Gmail SMTP.
+        Returns True once the email is queued; delivery happens in the background.
         """
         if not self.sender_email or not self.sender_password:
             print("⚠️ WARNING: Gmail credentials missing. Cannot send email.")
             return False
 
+        self.start()
         try:
-            # 1. Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = "Password Reset Request - AI Health Assistant"
-            message["From"] = f"AI Health Assistant <{self.sender_email}>"
-            message["To"] = target_email
-
-            reset_link = f"{self.frontend_url}/reset-password?token={token}"
-
-            # 2. Email Body (Non-technical & Clear)
-            text = f"""
-            Hello,
-
-            We received a request to reset your password for your AI Health Assistant account.
-            
-            Click the link below to set a new password:
-            {reset_link}
-
-            This link will expire in 15 minutes for your security.
-            If you did not request this change, please ignore this email.
-
-            Stay healthy,
-            AI Health Assistant Team
-            """
-
-            html = f"""
-            <html>
-              <body style="font-family: sans-serif; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #eee; border-radius: 10px;">
-                  <h2 style="color: #2D6A4F;">Password Reset Request</h2>
-                  <p>Hello,</p>
-                  <p>We received a request to reset your password for your AI Health Assistant account.</p>
-                  <p style="margin: 30px 0;">
-                    <a href="{reset_link}" style="background-color: #2D6A4F; color: white; padding: 12px 25px; text-decoration: none; border-radius: 5px; font-weight: bold;">Reset Password</a>
-                  </p>
-                  <p style="font-size: 0.9em; color: #666;">
-                    This link will expire in <strong>15 minutes</strong> for your security.
-                  </p>
-                  <p style="font-size: 0.9em; color: #666;">
-                    If you did not request this change, please ignore this email.
-                  </p>
-                  <hr style="border: 0; border-top: 1px solid #eee; margin: 20px 0;">
-                  <p style="font-size: 0.8em; color: #999;">
-                    AI Health Assistant - Secure Healthcare MVP
-                  </p>
-                </div>
-              </body>
-            </html>
-            """
-
-            # 3. Attach parts
-            part1 = MIMEText(text, "plain")
-            part2 = MIMEText(html, "html")
-            message.attach(part1)
-            message.attach(part2)
-
-            # 4. Connect and send
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()  # Secure the connection
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, target_email, message.as_string())
-            
-            print(f"📧 Password reset email sent to {target_email}")
-            return True
-
-        except Exception as e:
-            print(f"❌ Failed to send email: {e}")
+            self._queue.put_nowait((target_email, token))
+        except asyncio.QueueFull:
+            print("❌ Failed to queue email: outbound queue is full")
             return False
+        return True
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(hostname=self.smtp_server, port=self.smtp_port, start_tls=True)
+        await client.connect()
+        await client.login(self.sender_email, self.sender_password)
+        return client
+
+    @staticmethod
+    async def _close(client: Optional[aiosmtplib.SMTP]):
+        if client is None:
+            return
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    async def _worker(self):
+        queue = self._queue
+        client: Optional[aiosmtplib.SMTP] = None
+        sent_on_connection = 0
+        while True:
+            job = await queue.get()
+            if job is None:
+                break
+            target_email, token = job
+            message = self._build_reset_message(target_email, token)
+            # One retry on a fresh connection if the pooled one was dropped by the server
+            for attempt in range(2):
+                try:
+                    if client is None or sent_on_connection >= self.MAX_MESSAGES_PER_CONNECTION:
+                        await self._close(client)
+                        client = None
+                        client = await self._connect()
+                        sent_on_connection = 0
+                    await client.send_message(message)
+                    sent_on_connection += 1
+                    print(f"📧 Password reset email sent to {target_email}")
+                    break
+                except aiosmtplib.SMTPServerDisconnected as e:
+                    client = None
+                    if attempt == 1:
+                        print(f"❌ Failed to send email: {e}")
+                except Exception as e:
+                    await self._close(client)
+                    client = None
+                    print(f"❌ Failed to send email: {e}")
+                    break
+        await self._close(client)
+
+    def _build_reset_message(self, target_email: str, token: str) -> MIMEMultipart:
+        # 1. Create message
+        message = MIMEMultipart("alternative")
+        message["Subject"] = "Password Reset Request - AI Health Assistant"
+        message["From"] = self._from_header
+        message["To"] = target_email
+
+        reset_link = self._reset_url_prefix + token
+
+        # 2. Email Body (Non-technical & Clear), from the templates compiled at import
+        text = _TEXT_TMPL.substitute(reset_link=reset_link)
+        html = _HTML_TMPL.substitute(reset_link=reset_link)
+
+        # 3. Attach parts
+        message.attach(MIMEText(text, "plain"))
+        message.attach(MIMEText(html, "html"))
+
+        return message
 
 email_service = EmailService()
@@ -1,22 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from .models import User, UserFeedback
-from .database import get_db
-from sqlalchemy.orm import Session
+from .database import get_async_db, AsyncSessionLocal
+from .auth import get_current_user
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from .audit_logger import audit_logger
 from .schemas import FeedbackIn
 from typing import Optional
-from jose import jwt, JWTError
-import os
 
 router = APIRouter(prefix="/feedback", tags=["Feedback"])
 
-SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-ALGORITHM = "HS256"
-
-async def get_optional_user(request: Request, db: Session = Depends(get_db)):
+async def get_optional_user(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Optional user dependency for feedback.
     If no token or invalid token, returns None (guest).
+    Shares the auth token caches, so a recently seen token costs no JWT verify or user query.
     """
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -24,61 +23,81 @@ async def get_optional_user(request: Request, db: Session = Depends(get_db)):
     
     token = auth_header.split(" ")[1]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        user = db.query(User).filter(User.email == email).first()
-        return user
-    except (JWTError, Exception):
+        return await get_current_user(token, db)
+    except Exception:
         return None
 
-@router.post("/")
+async def _persist_feedback(feedback: FeedbackIn, user_id: Optional[int], request: Request):
+    """
+    Writes one feedback row after the response has been sent.
+    Uses its own session: request-scoped dependencies are closed by the time this runs.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            # Core INSERT ... RETURNING: one statement, no ORM instance or identity-map bookkeeping.
+            # Duplicates (same query_id) hit the partial unique index and return no row, so the
+            # check and the insert are one atomic round-trip.
+            stmt = pg_insert(UserFeedback).values(
+                query_id=feedback.query_id,
+                user_id=user_id,
+                helpful=1 if feedback.helpful else 0,
+                reason=feedback.reason,
+                comment=feedback.comment,
+                model_used=feedback.model_used,
+                confidence_score=feedback.confidence_score
+            ).on_conflict_do_nothing(
+                index_elements=[UserFeedback.query_id],
+                index_where=text("query_id IS NOT NULL")
+            ).returning(UserFeedback.id)
+            inserted = (await db.execute(stmt)).first()
+            await db.commit()
+    except Exception as e:
+        print(f"❌ Feedback Error: {e}")
+        await audit_logger.log_event(
+            action="USER_FEEDBACK",
+            status="FAILURE",
+            user_id=user_id,
+            request=request,
+            metadata={"reason": "Storage error"}
+        )
+        return
+
+    if inserted is None:
+        await audit_logger.log_event(
+            action="USER_FEEDBACK",
+            status="FAILURE",
+            user_id=user_id,
+            request=request,
+            metadata={"reason": "Duplicate feedback for query", "query_id": feedback.query_id}
+        )
+        return
+
+    await audit_logger.log_event(
+        action="USER_FEEDBACK",
+        status="SUCCESS",
+        user_id=user_id,
+        request=request,
+        metadata={
+            "helpful": feedback.helpful,
+            "reason": feedback.reason,
+            "has_comment": bool(feedback.comment)
+        }
+    )
+
+@router.post("/", status_code=202)
 async def submit_feedback(
     request: Request,
     feedback: FeedbackIn,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
     current_user: Optional[User] = Depends(get_optional_user)
 ):
     """
     Submit manual feedback for AI responses.
     Stores minimal metadata for internal improvement.
+    The payload is validated here; storage happens after the 202 response is sent
+    (duplicates for the same query_id are dropped by the unique index).
     """
-    # Check for existing feedback to prevent duplicates if query_id is provided
-    if feedback.query_id:
-        existing = db.query(UserFeedback).filter(UserFeedback.query_id == feedback.query_id).first()
-        if existing:
-            raise HTTPException(
-                status_code=400,
-                detail="Feedback already exists for this query."
-            )
-
-    try:
-        new_feedback = UserFeedback(
-            query_id=feedback.query_id,
-            user_id=current_user.id if current_user else None,
-            helpful=1 if feedback.helpful else 0,
-            reason=feedback.reason,
-            comment=feedback.comment,
-            model_used=feedback.model_used,
-            confidence_score=feedback.confidence_score
-        )
-        db.add(new_feedback)
-        db.commit()
-        
-        await audit_logger.log_event(
-            action="USER_FEEDBACK",
-            status="SUCCESS",
-            user_id=current_user.id if current_user else None,
-            request=request,
-            metadata={
-                "helpful": feedback.helpful,
-                "reason": feedback.reason,
-                "has_comment": bool(feedback.comment)
-            }
-        )
-        
-        return {"status": "success", "message": "Thank you for your valuable feedback."}
-    except Exception as e:
-        print(f"❌ Feedback Error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to store feedback.")
+    background_tasks.add_task(
+        _persist_feedback, feedback, current_user.id if current_user else None, request
+    )
+    return {"status": "accepted", "message": "Thank you for your valuable feedback."}
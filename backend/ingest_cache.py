@@ -0,0 +1,76 @@
+# backend/ingest_cache.py
+"""
+On-disk record of what bulk ingestion last wrote, so re-runs only upsert documents whose
+content changed.
+
+Layout: {index_name: {doc_id: [content_hash, dataset]}}
+
+Entries are kept per Pinecone index (switching PINECONE_INDEX starts from an empty record),
+and carry the document's 'dataset' metadata so delete_datasets.py can forget exactly the
+documents it removed from the index.
+"""
+import os
+import json
+import atexit
+import hashlib
+import orjson
+from typing import Optional
+from backend.rag_service import PINECONE_INDEX_NAME
+
+INGEST_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ingest_cache.json")
+
+def _load():
+    try:
+        with open(INGEST_CACHE_PATH, "rb") as f:
+            data = orjson.loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    # Older flat {doc_id: hash} files have no index/dataset information; start over from them
+    return {index: entries for index, entries in data.items() if isinstance(entries, dict)}
+
+_cache = _load()
+_dirty = False
+
+def _entries(index_name: Optional[str] = None) -> dict:
+    return _cache.setdefault(index_name or PINECONE_INDEX_NAME, {})
+
+def content_hash(text, metadata) -> str:
+    payload = text + json.dumps(metadata, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def is_unchanged(doc_id: str, doc_hash: str) -> bool:
+    entry = _entries().get(doc_id)
+    return entry is not None and entry[0] == doc_hash
+
+def record(doc_id: str, doc_hash: str, dataset: Optional[str]):
+    global _dirty
+    _entries()[doc_id] = [doc_hash, dataset]
+    _dirty = True
+
+def forget_dataset(dataset: str, index_name: Optional[str] = None) -> int:
+    """Drops every entry written with the given 'dataset' metadata. Returns how many were dropped."""
+    global _dirty
+    entries = _entries(index_name)
+    stale = [doc_id for doc_id, (_, doc_dataset) in entries.items() if doc_dataset == dataset]
+    for doc_id in stale:
+        del entries[doc_id]
+    _dirty = _dirty or bool(stale)
+    return len(stale)
+
+def forget_index(index_name: Optional[str] = None):
+    """Drops every entry for the index, so the next ingest re-upserts everything."""
+    global _dirty
+    _cache.pop(index_name or PINECONE_INDEX_NAME, None)
+    _dirty = True
+
+@atexit.register
+def save():
+    if not _dirty:
+        return
+    try:
+        tmp_path = INGEST_CACHE_PATH + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(_cache))
+        os.replace(tmp_path, INGEST_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Could not save ingest cache: {e}")
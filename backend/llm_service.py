@@ -1,79 +1,184 @@
 # backend/llm_service.py
-import os
+import re
 import json
+import orjson
+import asyncio
+import hashlib
+import logging
+import logging.handlers
+import queue
+import atexit
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+from string import Formatter
+import ahocorasick
 import groq
+import httpx
+from cachetools import TTLCache
+from types import MappingProxyType
 from typing import Any
 from groq import AsyncGroq
-from dotenv import load_dotenv
-from fastapi import Request
+from fastapi import Request, HTTPException
 from sqlalchemy.orm import Session
 from .database import SessionLocal
 from .models import SystemConfig
 from .schemas import RiskAssessment, Explanation, Recommendations, HealthReport
 from . import mongo_memory
 from .rag_service import rag_service
-from .structured_memory import structured_memory
-from .rag_router import rag_router, QueryIntent, DatasetType
+from .semantic_cache import semantic_cache, normalize_query, evidence_signature
+from .structured_memory import structured_memory, NO_MEMORY_CONTEXT
+from .rag_router import rag_router, QueryIntent, DatasetType, DISEASE_SYMPTOM_PATTERNS
 from .audit_logger import audit_logger
-
-load_dotenv()
+from .config import settings
+
+# --- Logging ---
+# Fast-path diagnostics go through a queue: the request coroutine only enqueues the record and a
+# listener thread does the (blocking) write to stderr. Per-request details log at DEBUG, so their
+# formatting is skipped unless LLM_LOG_LEVEL=DEBUG.
+logger = logging.getLogger(__name__)
+logger.setLevel(settings().LLM_LOG_LEVEL)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_stream = logging.StreamHandler(sys.stderr)
+_log_stream.setFormatter(logging.Formatter("%(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 # --- Configuration ---
 PRIMARY_MODEL = "llama-3.3-70b-versatile"
 FALLBACK_MODEL = "llama-3.1-8b-instant"  # Faster, higher rate limits
 LLM_MODEL = PRIMARY_MODEL
+LLM_TIMEOUT_SECONDS = 30.0  # Per attempt; a hung request must not pin the handler
+
+# Cap on in-flight chat completions per worker; bursts queue here instead of turning into 429 storms.
+# 429s that still occur are retried by the SDK with exponential backoff (honouring Retry-After).
+GROQ_MAX_CONCURRENCY = settings().GROQ_MAX_CONCURRENCY
+GROQ_MAX_RETRIES = 2
+_GROQ_SEM = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+GROQ_API_KEY = settings().GROQ_API_KEY
+# One pooled HTTP client per worker, sized so every semaphore slot keeps a warm keep-alive connection
+_groq_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=GROQ_MAX_CONCURRENCY * 2, max_keepalive_connections=GROQ_MAX_CONCURRENCY),
+    timeout=LLM_TIMEOUT_SECONDS
+) if GROQ_API_KEY else None
+client = AsyncGroq(
+    api_key=GROQ_API_KEY,
+    timeout=LLM_TIMEOUT_SECONDS,
+    max_retries=GROQ_MAX_RETRIES,
+    http_client=_groq_http_client
+) if GROQ_API_KEY else None
+
+# Completions for byte-identical requests (same messages, format and model choice);
+# repeated controller / modality / symptom prompts are answered without a Groq round-trip
+LLM_CACHE_TTL_SECONDS = 600
+_completion_cache = TTLCache(maxsize=2048, ttl=LLM_CACHE_TTL_SECONDS)
+
+def _completion_cache_key(messages: list[dict], response_format: dict | None, use_primary: bool) -> str:
+    payload = orjson.dumps([messages, response_format, use_primary], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def require_llm() -> AsyncGroq:
+    """
+    Route dependency for LLM-backed endpoints: a uniform 503 when Groq is not configured,
+    raised before any upload or model work is done.
+    """
+    if client is None:
+        raise HTTPException(status_code=503, detail="LLM service unavailable: GROQ_API_KEY not configured.")
+    return client
+
+async def warm_up_llm():
+    """Opens a pooled connection to Groq at startup so the first user request skips the TLS handshake."""
+    if client is None:
+        return
+    try:
+        # Short and single-shot: an unreachable API must not hold up startup
+        await client.with_options(timeout=5.0, max_retries=0).models.list()
+        print("✅ Groq connection pool warmed up.")
+    except Exception as e:
+        print(f"⚠️ WARNING: Groq warm-up failed (will connect on first request). Error: {e}")
+
+async def close_llm():
+    if client is not None:
+        await client.close()
 
-client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY")) if os.getenv("GROQ_API_KEY") else None
+async def _create_completion(messages: list[dict], model: str, response_format: dict | None) -> str:
+    async with _GROQ_SEM:
+        response = await client.chat.completions.create(
+            messages=messages,
+            model=model,
+            response_format=response_format
+        )
+    return response.choices[0].message.content
 
 if client:
-    print(f"✅ Async Groq client for LLM initialized. Primary: {PRIMARY_MODEL}, Fallback: {FALLBACK_MODEL}")
+    logger.info("✅ Async Groq client for LLM initialized. Primary: %s, Fallback: %s", PRIMARY_MODEL, FALLBACK_MODEL)
 else:
-    print("⚠️ WARNING: GROQ_API_KEY not found! LLM service disabled.")
+    logger.warning("⚠️ WARNING: GROQ_API_KEY not found! LLM service disabled.")
+
+# Identical completions already in flight (e.g. the same controller prompt from concurrent users);
+# later callers await the first request instead of issuing their own
+_inflight_completions: dict[tuple[str, bool], asyncio.Future] = {}
 
 async def call_llm_with_fallback(messages: list[dict], response_format: dict | None = None, use_primary: bool = True, allow_fallback: bool = True) -> str:
     """
     Calls Groq LLM with automatic fallback to a smaller model if rate limited.
     """
     if not client:
-        return json.dumps({"summary": "Service Unavailable", "disclaimer": "Check API Keys"})
-
+        return _ERR_NO_KEYS
+
+    cache_key = _completion_cache_key(messages, response_format, use_primary)
+    cached = _completion_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("⚡ LLM cache hit")
+        return cached
+
+    inflight_key = (cache_key, allow_fallback)
+    pending = _inflight_completions.get(inflight_key)
+    if pending is None:
+        pending = asyncio.ensure_future(_complete_with_fallback(messages, response_format, use_primary, allow_fallback, cache_key))
+        _inflight_completions[inflight_key] = pending
+        pending.add_done_callback(lambda _: _inflight_completions.pop(inflight_key, None))
+    else:
+        logger.debug("⚡ LLM request coalesced with an identical in-flight call")
+    # Shielded so one caller's cancellation does not cancel the call for the others
+    return await asyncio.shield(pending)
+
+async def _complete_with_fallback(messages: list[dict], response_format: dict | None, use_primary: bool, allow_fallback: bool, cache_key: str) -> str:
     # Determine which model to start with
     current_model = PRIMARY_MODEL if use_primary else FALLBACK_MODEL
     
     try:
         # Attempt 1
-        print(f"🤖 Calling LLM ({current_model})...")
-        response = await client.chat.completions.create(
-            messages=messages,
-            model=current_model,
-            response_format=response_format
-        )
-        return response.choices[0].message.content
+        logger.debug("🤖 Calling LLM (%s)...", current_model)
+        content = await _create_completion(messages, current_model, response_format)
+        _completion_cache[cache_key] = content
+        return content
     except groq.RateLimitError as e:
         # If we already tried the fallback or if we were using the primary and it failed
         if current_model == PRIMARY_MODEL and allow_fallback:
-            print(f"⚠️ Rate limit reached for {PRIMARY_MODEL}. Falling back to {FALLBACK_MODEL}...")
+            logger.warning("⚠️ Rate limit reached for %s. Falling back to %s...", PRIMARY_MODEL, FALLBACK_MODEL)
             try:
                 # Attempt 2 with fallback model
-                response = await client.chat.completions.create(
-                    messages=messages,
-                    model=FALLBACK_MODEL,
-                    response_format=response_format
-                )
-                return response.choices[0].message.content
+                content = await _create_completion(messages, FALLBACK_MODEL, response_format)
+                _completion_cache[cache_key] = content
+                return content
             except Exception as fallback_error:
-                print(f"❌ Fallback model also failed: {fallback_error}")
+                logger.error("❌ Fallback model also failed: %s", fallback_error)
                 raise fallback_error
         else:
-            print(f"❌ Rate limit reached for {current_model}. No further fallback available.")
+            logger.error("❌ Rate limit reached for %s. No further fallback available.", current_model)
             raise e
     except Exception as e:
-        print(f"❌ LLM Error ({current_model}): {e}")
+        logger.error("❌ LLM Error (%s): %s", current_model, e)
         raise e
 
 # --- Symptom Fallback Dictionary (CRITICAL SAFETY FEATURE) ---
 # This ensures symptom queries NEVER fail, even if RAG is down or data is missing
-SYMPTOM_FALLBACKS = {
+SYMPTOM_FALLBACKS = MappingProxyType({
     "nausea": "Nausea is a feeling of sickness with an urge to vomit. Common causes include food poisoning, motion sickness, pregnancy, medications, viral infections, or digestive issues. Stay hydrated with small sips of water or clear fluids. Avoid strong smells and greasy foods. Rest in a comfortable position. See a doctor if nausea persists beyond 24-48 hours, is accompanied by severe abdominal pain, or if you cannot keep fluids down.",
     
     "headache": "Headaches are pain or discomfort in the head or face area. Common types include tension headaches (from stress or muscle tension), migraines (often with sensitivity to light/sound), and cluster headaches. Causes range from dehydration, stress, lack of sleep, eye strain, to underlying conditions. Rest in a quiet, dark room, stay hydrated, and over-the-counter pain relievers may help. Seek immediate medical attention for sudden severe headaches, headaches after head injury, or headaches with fever, stiff neck, confusion, or vision changes.",
@@ -133,84 +238,194 @@ SYMPTOM_FALLBACKS = {
     "anxiety": "Anxiety is feelings of worry, nervousness, or unease. Common causes include stress, major life changes, trauma, caffeine, or underlying anxiety disorders. Practice relaxation techniques (deep breathing, meditation), regular exercise, adequate sleep, limit caffeine, and talk to someone you trust. Seek professional help if anxiety is severe, persistent, interferes with daily life, or if you experience panic attacks.",
     
     "confusion": "Confusion is difficulty thinking clearly, concentrating, or making decisions. Common causes include dehydration, low blood sugar, medications, infections, sleep deprivation, or serious conditions. Ensure hydration, check blood sugar if diabetic, and rest. SEEK IMMEDIATE MEDICAL ATTENTION if confusion is sudden, severe, accompanied by fever, headache, stiff neck, difficulty breathing, chest pain, or if the person is elderly or has chronic conditions."
-}
+})
+
+def _build_automaton(words) -> ahocorasick.Automaton:
+    # Each word maps to its list position so callers can keep declaration-order priority
+    automaton = ahocorasick.Automaton()
+    for priority, word in enumerate(words):
+        automaton.add_word(word, (priority, word))
+    automaton.make_automaton()
+    return automaton
+
+# All fallback symptoms matched in one linear pass over the query
+_SYMPTOM_AC = _build_automaton(SYMPTOM_FALLBACKS)
+_SYMPTOM_KEYS = tuple(SYMPTOM_FALLBACKS)
+# Fallback texts by automaton priority, so a hit is one tuple index rather than a dict lookup
+_SYMPTOM_TEXTS = tuple(SYMPTOM_FALLBACKS.values())
+
+# "symptoms of <disease>"-style phrasing that must not take the symptom shortcut (shared with the router)
+_DISEASE_PATTERN_AC = _build_automaton(DISEASE_SYMPTOM_PATTERNS)
+
+@lru_cache(maxsize=4096)
+def _symptom_priorities(text_lower: str) -> frozenset[int]:
+    """
+    Declaration-order indices of every fallback symptom found in the text.
+    Memoized: the same recent user turns are re-checked on every request of a conversation.
+    """
+    return frozenset(priority for _, (priority, _) in _SYMPTOM_AC.iter(text_lower))
 
-def get_symptom_fallback(query: str) -> str:
+def get_symptom_fallback(query: str, query_lower: str | None = None) -> str:
     """
     Returns a safe, general symptom explanation if the query matches a known symptom.
     This is a CRITICAL SAFETY FEATURE to prevent "No information available" failures.
     
     Args:
         query: User's query text
+        query_lower: query.lower(), if the caller already has it
         
     Returns:
         Fallback explanation if symptom detected, None otherwise
     """
-    query_lower = query.lower()
-    
-    # Check for exact or partial matches
-    for symptom, explanation in SYMPTOM_FALLBACKS.items():
-        if symptom in query_lower:
-            return explanation
-    
-    return None
+    if query_lower is None:
+        query_lower = query.lower()
+    return _symptom_fallback_for(query_lower)
+
+@lru_cache(maxsize=2048)
+def _symptom_fallback_for(query_lower: str) -> str | None:
+    # Pure function of the lowered query, so repeats (and re-checks within a request) are memoized
+    # Check for exact or partial matches; the earliest-declared symptom wins, as before
+    first = min(_symptom_priorities(query_lower), default=None)
+    if first is None:
+        return None
+    return _SYMPTOM_TEXTS[first]
+
+def is_disease_symptom_query(query_lower: str) -> bool:
+    """True if the (lowercased) query asks about the symptoms of a condition."""
+    return next(_DISEASE_PATTERN_AC.iter(query_lower), None) is not None
+
+# --- Pre-serialized shortcut / fallback responses ---
+# The symptom-shortcut and fallback replies differ only in the fallback text, so their JSON is encoded once
+# here and the (JSON-escaped) text is spliced in per request.
+_SHORTCUT_SLOT = "__SYMPTOM_SHORTCUT__"
+
+_SHORTCUT_FOLLOW_UP_JSON = json.dumps({
+    "type": "health_report",
+    "health_information": f"I see you're still experiencing this symptom. {_SHORTCUT_SLOT}\n\nSince this is continuing, I recommend:\n1. Keep track of when it occurs and any triggers\n2. Note if it's getting better, worse, or staying the same\n3. Consider consulting a healthcare professional if it persists or worsens",
+    "possible_conditions": ["Ongoing symptom - monitoring recommended"],
+    "reasoning_brief": "Following up on previously discussed symptom with additional guidance.",
+    "recommended_next_steps": "If symptoms persist or worsen, please consult a healthcare professional for personalized evaluation.",
+    "ai_confidence": "High - Follow-up Guidance",
+    "trusted_sources": ["Medical Knowledge Base", "MedlinePlus (NIH)"],
+    "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
+})
+
+_SHORTCUT_FIRST_TIME_JSON = json.dumps({
+    "type": "health_report",
+    "health_information": _SHORTCUT_SLOT,
+    "possible_conditions": ["Various causes possible - not a diagnosis"],
+    "reasoning_brief": "Providing general information about this common symptom.",
+    "recommended_next_steps": "Monitor your symptoms. Consult a healthcare professional if symptoms persist, worsen, or are accompanied by other concerning signs.",
+    "ai_confidence": "High - General Symptom Information",
+    "trusted_sources": ["Medical Knowledge Base", "MedlinePlus (NIH)"],
+    "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
+})
+
+_FALLBACK_DIRECT_JSON = json.dumps({
+    "type": "health_report",
+    "health_information": _SHORTCUT_SLOT,
+    "possible_conditions": ["Various causes possible - not a diagnosis"],
+    "reasoning_brief": "Providing general information about this symptom based on medical knowledge.",
+    "recommended_next_steps": "Monitor your symptoms. Consult a healthcare professional if symptoms persist, worsen, or are accompanied by other concerning signs.",
+    "ai_confidence": "High - General Symptom Information",
+    "trusted_sources": ["Medical Knowledge Base", "MedlinePlus (NIH)"],
+    "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
+})
+
+_FALLBACK_LAST_RESORT_JSON = json.dumps({
+    "type": "health_report",
+    "health_information": _SHORTCUT_SLOT,
+    "possible_conditions": ["Various causes possible"],
+    "reasoning_brief": "Using general symptom information due to system limitations.",
+    "recommended_next_steps": "Consult a healthcare professional for personalized advice.",
+    "ai_confidence": "Medium - General Information",
+    "trusted_sources": ["Medical Knowledge Base"],
+    "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
+})
+
+_ERR_NO_KEYS = json.dumps({"summary": "Service Unavailable", "disclaimer": "Check API Keys"})
+_ERR_NO_INPUT = json.dumps({"summary": "No input provided.", "disclaimer": "Please provide symptoms or upload a report."})
+_ERR_ANALYSIS_FAILED = json.dumps({
+    "type": "health_report",
+    "health_information": "I encountered an error while processing your request. Please try again or consult a professional.",
+    "ai_confidence": "Low - System Error",
+    "disclaimer": "This is not a diagnosis. Consult a professional."
+})
+
+def _fill_shortcut(template: str, symptom_shortcut: str) -> str:
+    # json.dumps(...)[1:-1] is the escaped string body, without its surrounding quotes
+    return template.replace(_SHORTCUT_SLOT, json.dumps(symptom_shortcut)[1:-1], 1)
 
 # --- Helper Functions ---
+_BMI_BINS = (18.5, 25.0, 30.0)
+_BMI_LABELS = ("Underweight", "Normal", "Overweight", "Obese")
+
 def calculate_bmi(weight, height):
-    if weight and height:
-        try:
-            bmi = weight / ((height / 100) ** 2)
-            if bmi < 18.5: return f"{bmi:.1f} (Underweight)"
-            if bmi < 25: return f"{bmi:.1f} (Normal)"
-            if bmi < 30: return f"{bmi:.1f} (Overweight)"
-            return f"{bmi:.1f} (Obese)"
-        except:
-            return "Unknown"
-    return "Unknown"
+    if not (isinstance(weight, (int, float)) and isinstance(height, (int, float)) and weight > 0 and height > 0):
+        return "Unknown"
+    bmi = weight / ((height / 100) ** 2)
+    return f"{bmi:.1f} ({_BMI_LABELS[bisect_right(_BMI_BINS, bmi)]})"
+
+def _ascii_only(text: str) -> str:
+    """Drops non-ASCII characters (encoding artifacts); ASCII text is returned as-is without copying."""
+    return text if text.isascii() else text.encode('ascii', 'ignore').decode('ascii')
 
 # --- Safety Layer (Guardrails) ---
+def _emergency_response(keyword: str) -> dict[str, Any]:
+    return {
+        "summary": "🚨 CRITICAL SAFETY ALERT",
+        "possible_causes": ["Potential Medical Emergency"],
+        "risk_assessment": {
+            "severity": "EMERGENCY",
+            "confidence_score": 1.0,
+            "uncertainty_reason": "Keyword detected: " + keyword
+        },
+        "explanation": {
+            "reasoning": f"You mentioned '{keyword}', which requires immediate medical attention.",
+            "history_factor": "Safety Override Triggered",
+            "profile_factor": "N/A"
+        },
+        "recommendations": {
+            "immediate_action": "CALL EMERGENCY SERVICES (911) IMMEDIATELY.",
+            "lifestyle_advice": ["Do not wait.", "Seek professional help now."],
+            "food_advice": []
+        },
+        "disclaimer": "This system cannot handle emergencies. Please contact local authorities."
+    }
+
+def _emergency_result(keyword: str) -> dict[str, Any]:
+    response = _emergency_response(keyword)
+    # response_json is the serialized reply, encoded once alongside the dict
+    return {"is_safe": False, "response": response, "response_json": json.dumps(response)}
+
 class Guardrails:
     CRITICAL_KEYWORDS = ["suicide", "kill myself", "chest pain", "heart attack", "stroke", "difficulty breathing", "unconscious"]
+    # One alternation scans the text once instead of once per keyword
+    _CRIT_RE = re.compile("|".join(map(re.escape, CRITICAL_KEYWORDS)))
+    # The alert for each keyword never changes, so it is built once here (read-only)
+    _CRIT_RESPONSES = {keyword: _emergency_result(keyword) for keyword in CRITICAL_KEYWORDS}
     
     @staticmethod
-    def check_safety(text: str) -> dict[str, Any]:
+    def check_safety(text: str, text_lower: str | None = None) -> dict[str, Any]:
         """
         Deterministic safety check.
         Returns None if safe, or a predefined Error Response if unsafe.
         """
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
         
         # 1. Emergency Detection
-        for keyword in Guardrails.CRITICAL_KEYWORDS:
-            if keyword in text_lower:
-                return {
-                    "is_safe": False,
-                    "response": {
-                        "summary": "🚨 CRITICAL SAFETY ALERT",
-                        "possible_causes": ["Potential Medical Emergency"],
-                        "risk_assessment": {
-                            "severity": "EMERGENCY",
-                            "confidence_score": 1.0,
-                            "uncertainty_reason": "Keyword detected: " + keyword
-                        },
-                        "explanation": {
-                            "reasoning": f"You mentioned '{keyword}', which requires immediate medical attention.",
-                            "history_factor": "Safety Override Triggered",
-                            "profile_factor": "N/A"
-                        },
-                        "recommendations": {
-                            "immediate_action": "CALL EMERGENCY SERVICES (911) IMMEDIATELY.",
-                            "lifestyle_advice": ["Do not wait.", "Seek professional help now."],
-                            "food_advice": []
-                        },
-                        "disclaimer": "This system cannot handle emergencies. Please contact local authorities."
-                    }
-                }
+        m = Guardrails._CRIT_RE.search(text_lower)
+        if m:
+            return Guardrails._CRIT_RESPONSES[m.group(0)]
         return {"is_safe": True}
 
 guardrails = Guardrails()
 
 # --- History Layer (Analysis) ---
+# Filler words that would otherwise count as "similar symptoms" in analyze_history_trends
+_TREND_STOP_WORDS = frozenset({"i", "a", "the", "have", "is", "am", "of", "and", "to", "with"})
+
 def analyze_history_trends(history: list[dict], current_symptoms: str) -> str:
     """
     Analyzes past messages to detect patterns like worsening symptoms or repetition.
@@ -223,15 +438,19 @@ def analyze_history_trends(history: list[dict], current_symptoms: str) -> str:
         return "No recent user symptoms found in history."
 
     # Simple heuristic: Check if last 3 messages contain similar keywords to current
-    current_words = set(current_symptoms.lower().split())
+    current_words = set(current_symptoms.lower().split()) - _TREND_STOP_WORDS
     repeated_count = 0
     
     for prev in recent_symptoms:
-        prev_words = set(prev.lower().split())
-        # Check for meaningful overlap (ignoring common stop words would be better, but this is a start)
-        overlap = current_words.intersection(prev_words)
-        if len(overlap) >= 2: # At least 2 matching words
-            repeated_count += 1
+        prev_words = frozenset(prev.lower().split())
+        # Count meaningful overlap, stopping as soon as 2 shared words are found
+        overlap = 0
+        for word in current_words:
+            if word in prev_words:
+                overlap += 1
+                if overlap >= 2: # At least 2 matching words
+                    repeated_count += 1
+                    break
             
     if repeated_count > 0:
         return f"⚠️ RECURRING ISSUE: User has reported similar symptoms in {repeated_count} of the last 3 interactions. Evaluate for worsening condition."
@@ -349,19 +568,6 @@ RETRIEVED MEDICAL KNOWLEDGE:
 {rag_data}
 """
 
-PROMPT_FEEDBACK_REFINER = """
-The user has indicated whether the response was helpful. 
-Feedback: {feedback_rating}
-Comment: {feedback_comment}
-
-If feedback is "negative":
-1. Identify which part was unclear or insufficient based on the previous response and user comment.
-2. Suggest what additional clarification or data is needed.
-3. Adjust strategy for future queries.
-
-Do not change medical facts. Improve clarity and questioning.
-"""
-
 # --- PROMPT: Medical Report Analysis ---
 PROMPT_REPORT_ANALYZER = """
 ✅ Medical Lab Result Explanation Assistant – SYSTEM PROMPT 
@@ -372,9 +578,7 @@ Your role is NOT to diagnose diseases.
 Your role is to EXPLAIN what the extracted lab values mean in simple, patient-friendly language.
 
 🔹 Input Data
-- EXTRACTED LAB DATA: {report_text}
-- USER CONTEXT: {user_context}
-- MEDICAL REFERENCE DATA (RAG): {rag_data}
+Provided in the user message: EXTRACTED LAB DATA, USER CONTEXT, MEDICAL REFERENCE DATA (RAG).
 
 ──────────────────────────────── 
 1. NEVER STOP AT EXTRACTION 
@@ -424,27 +628,34 @@ Example: "Overall, the available values appear mostly within normal limits, whic
 ──────────────────────────────── 
 6. OUTPUT STRUCTURE (MANDATORY JSON) 
 ──────────────────────────────── 
-{{ 
+{ 
   "type": "medical_report_analysis", 
   "summary": "Overall summary (as per Rule 4).", 
   "test_analysis": [ 
-    {{ 
+    { 
       "test_name": "Marker Name (e.g. Hemoglobin)", 
       "value": "Value (or 'Not Provided')", 
       "normal_range": "Normal range (or 'Not Provided')", 
       "status": "Low | Normal | High | Borderline | Unknown", 
       "explanation": "Combine: 1. What it measures (body function). 2. What the result means. 3. Status explanation (as per Rule 2 & 3)." 
-    }} 
+    } 
   ], 
   "general_guidance": ["Safe lifestyle observations/tips based on findings"], 
   "when_to_consult_doctor": ["When to consult a doctor based on findings (as per Rule 6)"], 
   "ai_confidence": "Low | Medium | High (based on data clarity)", 
   "disclaimer": "This interpretation is informational and not a medical diagnosis." 
-}} 
+} 
 
 Tone: Calm, Supportive, Clear, Non-alarming.
 """
 
+# Per-request data for PROMPT_REPORT_ANALYZER, sent as the user message
+PROMPT_REPORT_ANALYZER_INPUT = """
+- EXTRACTED LAB DATA: {report_text}
+- USER CONTEXT: {user_context}
+- MEDICAL REFERENCE DATA (RAG): {rag_data}
+"""
+
 # --- PROMPT: Medical Image Analysis (Router & Specialists) ---
 PROMPT_MODALITY_DETECTOR = """
 You are a Medical Image Modality Detector. Your task is to classify an image analysis caption into one of the following modalities:
@@ -454,7 +665,7 @@ You are a Medical Image Modality Detector. Your task is to classify an image ana
 - medical_document (Text-based: Lab report, prescription, chart, graph, paper document)
 - unknown (Ambiguous or non-medical content)
 
-INPUT CAPTION: {image_caption}
+The INPUT CAPTION is provided in the user message.
 
 🚨 CLASSIFICATION RULES:
 1. If the caption mentions "Eye", "Retina", "Ocular", or "Red Eye", classify as 'ophthalmology'.
@@ -464,11 +675,11 @@ INPUT CAPTION: {image_caption}
 5. Look at the confidence scores in parentheses. If multiple modalities are mentioned, pick the one with the highest total score, BUT prioritize 'ophthalmology' and 'dermatology' for external photos and 'radiology' for internal scans.
 
 OUTPUT FORMAT (JSON):
-{{
+{
   "modality": "radiology" | "dermatology" | "ophthalmology" | "medical_document" | "unknown",
   "confidence": float (0.0 to 1.0),
   "reason": "Brief explanation for the classification"
-}}
+}
 """
 
 PROMPT_SKIN_SPECIALIST = """
@@ -554,6 +765,30 @@ OUTPUT FORMAT (JSON):
 }}
 """
 
+class _CompiledPrompt:
+    """
+    A PROMPT_* template split once into its literal chunks and field names, so filling it
+    is a single join instead of re-parsing several kilobytes of braces on every request.
+    """
+    __slots__ = ("_parts",)
+
+    def __init__(self, template: str):
+        self._parts = tuple((literal, field) for literal, field, _, _ in Formatter().parse(template))
+
+    def format(self, **values) -> str:
+        return "".join([
+            literal if field is None else literal + str(values[field])
+            for literal, field in self._parts
+        ])
+
+MEMORY_SELECTOR_TMPL = _CompiledPrompt(PROMPT_MEMORY_SELECTOR)
+MEDICAL_RAG_TMPL = _CompiledPrompt(PROMPT_MEDICAL_RAG)
+REPORT_ANALYZER_INPUT_TMPL = _CompiledPrompt(PROMPT_REPORT_ANALYZER_INPUT)
+SKIN_SPECIALIST_TMPL = _CompiledPrompt(PROMPT_SKIN_SPECIALIST)
+EYE_SPECIALIST_TMPL = _CompiledPrompt(PROMPT_EYE_SPECIALIST)
+RADIOLOGY_SPECIALIST_TMPL = _CompiledPrompt(PROMPT_RADIOLOGY_SPECIALIST)
+HITL_ESCALATION_TMPL = _CompiledPrompt(PROMPT_HITL_ESCALATION)
+
 # --- Reasoning Layer (LLM) ---
 def is_feature_enabled(db: Session, key: str) -> bool:
     """Helper to check feature toggles within LLM service"""
@@ -575,16 +810,6 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
         use_hitl_escalation = is_feature_enabled(db, "feature_hitl_escalation")
         use_llm_fallback = is_feature_enabled(db, "feature_llm_fallback")
 
-        if not client:
-            await audit_logger.log_event(
-                action="AI_QUERY",
-                status="FAILURE",
-                user_id=user_id,
-                request=request,
-                metadata={"reason": "Service Unavailable - API Key missing"}
-            )
-            return json.dumps({"summary": "Service Unavailable", "disclaimer": "Check API Keys"})
-
         # --- STEP 1: Input Harmonization (Multimodal) ---
         user_text = inputs.get("text_query", "") or ""
         voice_text = inputs.get("transcribed_text", "") or ""
@@ -592,29 +817,36 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
         report_text = inputs.get("report_text", "") or ""
         user_confirmation = (inputs.get("user_confirmation", "skip") or "skip").lower()
         
-        print(f"DEBUG: Harmonized report_text length: {len(report_text)}")
-        if report_text:
-            print(f"DEBUG: report_text snippet: {report_text[:100]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Harmonized report_text length: %d", len(report_text))
+            if report_text:
+                logger.debug("report_text snippet: %s...", report_text[:100])
         
         # Ensure combined_input has at least a placeholder if report_text exists but OCR failed
-        combined_input = f"{user_text} {voice_text} {image_desc} {report_text}".strip()
+        if voice_text or image_desc or report_text:
+            combined_input = f"{user_text} {voice_text} {image_desc} {report_text}".strip()
+        else:
+            # Text-only request (the common case): nothing to join
+            combined_input = user_text.strip()
         if not combined_input and report_text:
             combined_input = "[Medical Report Analysis Requested]"
+        # Lowercased once and shared by every keyword / symptom check below
+        query_lower = combined_input.lower()
             
         # Check if ANY input was provided (including multimodal data)
         has_any_input = any([user_text, voice_text, image_desc, report_text])
         
         if not has_any_input:
-            return json.dumps({"summary": "No input provided.", "disclaimer": "Please provide symptoms or upload a report."})
+            return _ERR_NO_INPUT
 
         # --- STEP 1.5: Detect Analysis Mode ---
         is_report_analysis = False
         if report_text:
             is_report_analysis = True
             if "[PDF Report Uploaded" in report_text or "[Image Report Uploaded" in report_text:
-                print("⚠️ Report Analysis Mode (Placeholder detected)")
+                logger.warning("⚠️ Report Analysis Mode (Placeholder detected)")
             else:
-                print("📋 Entering Medical Report Analysis Mode")
+                logger.debug("📋 Entering Medical Report Analysis Mode")
         
         is_image_analysis = bool(image_desc) and not is_report_analysis
     
@@ -622,59 +854,56 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
         escalation_reason = None
 
         if is_report_analysis:
-            print("📋 Entering Medical Report Analysis Mode")
+            logger.debug("📋 Entering Medical Report Analysis Mode")
         elif is_image_analysis:
-            print("📷 Entering Medical Image Analysis Mode")
+            logger.debug("📷 Entering Medical Image Analysis Mode")
 
         # --- STEP 2: Deterministic Guardrails (Safety) ---
-        safety_result = guardrails.check_safety(combined_input)
+        safety_result = guardrails.check_safety(combined_input, query_lower)
         if not safety_result["is_safe"]:
-            return json.dumps(safety_result["response"])
+            return safety_result["response_json"]
 
         # --- STEP 2.5: SYMPTOM SHORTCUT CHECK (OPTIMIZATION) ---
         # Check if this is a common symptom query - if yes, skip LLM intent detection and go straight to fallback
         # This improves response time and reduces API costs for common queries
-        query_lower = combined_input.lower()
-        
+        # Check for direct symptom mentions once; STEP 6 / STEP 8 / error fallbacks reuse the result
+        symptom_fallback = get_symptom_fallback(combined_input, query_lower)
         # Skip symptom shortcut if in report analysis mode
         if is_report_analysis:
-            print("⏭️ Skipping symptom shortcut for report analysis")
+            logger.debug("⏭️ Skipping symptom shortcut for report analysis")
             symptom_shortcut = None
         else:
-            # Check for direct symptom mentions
-            symptom_shortcut = get_symptom_fallback(combined_input)
+            symptom_shortcut = symptom_fallback
         
         # Also check for "symptoms of/for [disease]" pattern - these should NOT use shortcut
-        is_disease_symptom_query = any(pattern in query_lower for pattern in [
-            "symptoms of", "symptoms for", "what are the symptoms", 
-            "signs of", "signs and symptoms"
-        ])
+        asks_disease_symptoms = is_disease_symptom_query(query_lower)
     
         # CONVERSATION MEMORY: Check if we already discussed this symptom recently
         already_discussed = False
         if history and len(history) > 0 and symptom_shortcut:
             # Check last 5 interactions for the same symptom
             # MongoDB history structure: [{"role": "user", "content": "I have nausea"}, {"role": "assistant", "content": "..."}]
-            for past_interaction in history[-5:]:
+            query_symptoms = _symptom_priorities(query_lower)
+            recent_user_lower = [
+                past_interaction.get("content", "").lower()
+                for past_interaction in history[-5:]
                 # Only check user messages, not assistant responses
-                if past_interaction.get("role") != "user":
-                    continue
-                    
-                past_query = past_interaction.get("content", "").lower()
-                
-                # Check if any symptom from our fallback dict was mentioned
-                for symptom_name in SYMPTOM_FALLBACKS.keys():
-                    if symptom_name in query_lower and symptom_name in past_query:
-                        already_discussed = True
-                        print(f"💬 CONVERSATION MEMORY: Already discussed '{symptom_name}' recently")
-                        print(f"   Previous query: {past_query[:50]}...")
-                        break
-                if already_discussed:
+                if past_interaction.get("role") == "user"
+            ]
+            for past_query in recent_user_lower:
+                # Check if any symptom from our fallback dict was mentioned in both
+                shared = query_symptoms & _symptom_priorities(past_query)
+                if shared:
+                    already_discussed = True
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("💬 CONVERSATION MEMORY: Already discussed '%s' recently", _SYMPTOM_KEYS[min(shared)])
+                        logger.debug("   Previous query: %s...", past_query[:50])
                     break
         
         # If it's a common symptom (not asking about disease symptoms) and we have fallback data, use shortcut
-        if symptom_shortcut and not is_disease_symptom_query and user_confirmation != "yes":
-            print(f"⚡ SYMPTOM SHORTCUT: Bypassing LLM for common symptom: {combined_input[:50]}...")
+        if symptom_shortcut and not asks_disease_symptoms and user_confirmation != "yes":
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("⚡ SYMPTOM SHORTCUT: Bypassing LLM for common symptom: %s...", combined_input[:50])
             
             # Check if we should ask a follow-up even for shortcut symptoms (e.g., if very brief)
             intent_enum = QueryIntent.SYMPTOM_QUERY
@@ -686,12 +915,12 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                     request=request,
                     metadata={"type": "clarification_triggered", "symptom": combined_input[:50]}
                  )
-                 return json.dumps({
+                 return orjson.dumps({
                     "type": "clarification_questions",
                     "context": f"I can certainly help you with information about {combined_input}. To be more specific:",
                     "questions": ["How long have you been experiencing this?", "Are there any other symptoms accompanying it?"],
                     "requires_confirmation": True
-                })
+                }).decode()
 
             # If already discussed, provide follow-up response
             if already_discussed:
@@ -702,16 +931,7 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                     request=request,
                     metadata={"type": "symptom_shortcut", "already_discussed": True, "symptom": combined_input[:50]}
                 )
-                return json.dumps({
-                    "type": "health_report",
-                    "health_information": f"I see you're still experiencing this symptom. {symptom_shortcut}\n\nSince this is continuing, I recommend:\n1. Keep track of when it occurs and any triggers\n2. Note if it's getting better, worse, or staying the same\n3. Consider consulting a healthcare professional if it persists or worsens",
-                    "possible_conditions": ["Ongoing symptom - monitoring recommended"],
-                    "reasoning_brief": "Following up on previously discussed symptom with additional guidance.",
-                    "recommended_next_steps": "If symptoms persist or worsen, please consult a healthcare professional for personalized evaluation.",
-                    "ai_confidence": "High - Follow-up Guidance",
-                    "trusted_sources": ["Medical Knowledge Base", "MedlinePlus (NIH)"],
-                    "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
-                })
+                return _fill_shortcut(_SHORTCUT_FOLLOW_UP_JSON, symptom_shortcut)
             
             # First time discussing this symptom
             await audit_logger.log_event(
@@ -721,16 +941,7 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                 request=request,
                 metadata={"type": "symptom_shortcut", "already_discussed": False, "symptom": combined_input[:50]}
             )
-            return json.dumps({
-                "type": "health_report",
-                "health_information": symptom_shortcut,
-                "possible_conditions": ["Various causes possible - not a diagnosis"],
-                "reasoning_brief": "Providing general information about this common symptom.",
-                "recommended_next_steps": "Monitor your symptoms. Consult a healthcare professional if symptoms persist, worsen, or are accompanied by other concerning signs.",
-                "ai_confidence": "High - General Symptom Information",
-                "trusted_sources": ["Medical Knowledge Base", "MedlinePlus (NIH)"],
-                "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
-            })
+            return _fill_shortcut(_SHORTCUT_FIRST_TIME_JSON, symptom_shortcut)
 
         # --- STEP 3: Intent Detection (RAG Router) ---
         # Use RAG router for deterministic, enterprise-grade intent detection
@@ -741,15 +952,82 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
             intent_enum = rag_router.detect_intent(combined_input, history)
             detected_intent = intent_enum.name.lower().replace('_query', '_based')  # Convert to old format for compatibility
         
-        print(f"🎯 RAG Router detected intent: {intent_enum.name} -> {detected_intent}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🎯 RAG Router detected intent: %s -> %s", intent_enum.name, detected_intent)
         
-        # Also run LLM controller for clarification decision (but use router intent)
-        if is_report_analysis:
-            # Skip controller for report analysis - go straight to retrieval
-            ctrl = {"needs_clarification": False, "detected_intent": detected_intent}
-        else:
+        # STEP 4 only asks follow-ups when the (deterministic) router wants one for a first-turn symptom
+        # query, so that is the only case where the controller's opinion can change the outcome
+        needs_controller = (
+            not is_report_analysis
+            and user_confirmation == "skip"
+            and detected_intent == "symptom_based"
+            and rag_router.should_ask_follow_up(combined_input, intent_enum, history)
+        )
+        
+        # STEP 6 retrieval only depends on the routed query unless confirmed memory is merged into
+        # it (user_confirmation == "yes"), so otherwise it starts now and overlaps the LLM calls below.
+        # It is cancelled if the turn ends early with clarification questions.
+        # Small talk ("hi", "thanks") gets no evidence retrieval at all
+        use_retrieval = rag_service.enabled and (
+            is_report_analysis or is_image_analysis or rag_router.needs_retrieval(combined_input, intent_enum)
+        )
+        rag_task = None
+        if use_retrieval:
+            # Use RAG router for query augmentation and dataset routing
+            search_query = rag_router.augment_query(combined_input, intent_enum)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔍 Augmented query: %s...", search_query[:100])
+            if user_confirmation != "yes":
+                # Retrieve with higher top_k, then filter by allowed datasets
+                rag_task = asyncio.create_task(asyncio.to_thread(rag_service.search, search_query, top_k=12))
+        
+        # --- STEP 3.5: Answer Cache (general text questions only) ---
+        # Only the PROMPT_MEDICAL_RAG path is cached: it carries no per-user data (confirmed memory,
+        # image or report), so an exact or near-identical repeat skips retrieval and generation. The lookup
+        # (which may embed the query) overlaps the speculative retrieval started above.
+        answer_cache_scope = None
+        if not needs_controller and not is_report_analysis and not is_image_analysis and user_confirmation != "yes":
+            norm_query = normalize_query(query_lower)
+            answer_cache_scope = (detected_intent, use_llm_fallback)
+            cached_entry, query_vector = await semantic_cache.lookup(norm_query, answer_cache_scope)
+            grounded = False
+            if cached_entry is not None:
+                cached_analysis, cached_evidence = cached_entry
+                # Grounding gate: serve the cached answer only if today's retrieval still returns
+                # (mostly) the evidence it was written from. The docs are reused by STEP 6 on a miss.
+                current_docs = (await rag_task) if rag_task is not None else []
+                grounded = semantic_cache.is_grounded(cached_evidence, evidence_signature(current_docs))
+                if not grounded:
+                    logger.debug("♻️ Answer cache candidate rejected: retrieved evidence has changed")
+            if grounded:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("⚡ ANSWER CACHE HIT: %s...", combined_input[:50])
+                await audit_logger.log_event(
+                    action="AI_QUERY",
+                    status="SUCCESS",
+                    user_id=user_id,
+                    request=request,
+                    metadata={"type": "answer_cache_hit", "intent": detected_intent}
+                )
+                return cached_analysis
+        
+        # --- STEP 5 (prepared early): Contextual Memory Selection (Memory Selector) ---
+        user_id = str(profile.get("user_id", "unknown"))
+        confirmed_context = "None (user denied prior occurrence or no confirmation provided)"
+        raw_memory = None
+        if user_confirmation == "yes":
+            # Blocking Mongo read, kept off the event loop
+            relevant_memory_chunks = await asyncio.to_thread(structured_memory.get_relevant_history, user_id, combined_input)
+            raw_memory = structured_memory.summarize_memory(relevant_memory_chunks, combined_input)
+        
+        # Independent LLM calls are issued together so their latencies overlap:
+        # - the controller's clarification decision (only consulted on the first turn)
+        # - the memory selector (only when the user confirmed prior occurrence)
+        # - modality detection for image analysis (Layer 1, consumed in STEP 7)
+        pending_calls = {}
+        if needs_controller:
             # STEP 3: Use call_llm_with_fallback with use_primary=False to save tokens on primary model
-            ctrl_content = await call_llm_with_fallback(
+            pending_calls["ctrl"] = call_llm_with_fallback(
                 messages=[
                     {"role": "system", "content": PROMPT_CONTROLLER},
                     {"role": "user", "content": f"User Input: {combined_input}"}
@@ -758,67 +1036,101 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                 use_primary=False,  # Intent detection is simple, use smaller model by default
                 allow_fallback=use_llm_fallback
             )
-            try:
-                ctrl = json.loads(ctrl_content)
-                # Override LLM intent with router intent (router is more reliable)
-                ctrl["detected_intent"] = detected_intent
-                print(f"🎯 Final intent: {detected_intent}")
-            except json.JSONDecodeError:
-                print(f"⚠️ Controller JSON Error: {ctrl_content}")
-                ctrl = {"needs_clarification": False, "detected_intent": detected_intent}
+        if raw_memory and raw_memory != NO_MEMORY_CONTEXT:
+            pending_calls["memory"] = call_llm_with_fallback(
+                messages=[
+                    {"role": "system", "content": MEMORY_SELECTOR_TMPL.format(
+                        user_input=combined_input,
+                        user_confirmation=user_confirmation,
+                        past_data=raw_memory
+                    )}
+                ],
+                use_primary=False, # Memory selection is simple, use smaller model
+                allow_fallback=use_llm_fallback
+            )
+        if is_image_analysis:
+            pending_calls["modality"] = call_llm_with_fallback(
+                messages=[
+                    {"role": "system", "content": PROMPT_MODALITY_DETECTOR},
+                    {"role": "user", "content": f"INPUT CAPTION: {image_desc}"}
+                ],
+                response_format={"type": "json_object"},
+                allow_fallback=use_llm_fallback
+            )
+        call_results = dict(zip(
+            pending_calls,
+            await asyncio.gather(*pending_calls.values(), return_exceptions=True)
+        ))
+
+        # Also run LLM controller for clarification decision (but use router intent)
+        if "ctrl" not in call_results:
+            # Skip controller for report analysis / follow-up turns / turns the router will not
+            # clarify - go straight to retrieval
+            ctrl = {"needs_clarification": False, "detected_intent": detected_intent}
+        else:
+            ctrl_content = call_results["ctrl"]
+            if isinstance(ctrl_content, BaseException):
+                if rag_task is not None:
+                    rag_task.cancel()
+                raise ctrl_content
+            ctrl = {"needs_clarification": False, "detected_intent": detected_intent}
+            # The only key STEP 4 acts on is needs_clarification; without it there is nothing worth parsing
+            if "needs_clarification" in ctrl_content:
+                try:
+                    ctrl = orjson.loads(ctrl_content)
+                    # Override LLM intent with router intent (router is more reliable)
+                    ctrl["detected_intent"] = detected_intent
+                    logger.debug("🎯 Final intent: %s", detected_intent)
+                except orjson.JSONDecodeError:
+                    logger.warning("⚠️ Controller JSON Error: %s", ctrl_content)
+                    ctrl = {"needs_clarification": False, "detected_intent": detected_intent}
         
         # --- STEP 4: Clarification Loop (Follow-up) with CONVERSATION STATE CHECK ---
         # Only ask clarification if:
         # 1. This is the FIRST interaction (user_confirmation == "skip")
         # 2. We haven't already asked clarification for this query in conversation history
         
-        if not is_report_analysis and user_confirmation == "skip":
-            # Use RAG router's anti-loop logic for follow-up decision
-            should_ask = rag_router.should_ask_follow_up(combined_input, intent_enum, history)
-            
-            # If router says ask AND controller agrees, then ask
-            if should_ask and ctrl.get("needs_clarification") and detected_intent == "symptom_based":
-                return json.dumps({
+        if needs_controller:
+            # RAG router's anti-loop logic already said ask (needs_controller);
+            # ask only if the controller agrees
+            if ctrl.get("needs_clarification"):
+                if rag_task is not None:
+                    rag_task.cancel()  # Evidence is not needed for a clarification turn
+                return orjson.dumps({
                     "type": "clarification_questions",
                     "context": "To provide a more accurate assessment, I have a few follow-up questions:",
                     "questions": ctrl.get("questions", ["Have you experienced this before?"]),
                     "requires_confirmation": True # Trigger Yes/No/Skip UI in frontend
-                })
+                }).decode()
 
-        # --- STEP 5: Contextual Memory Selection (Memory Selector) ---
-        user_id = str(profile.get("user_id", "unknown"))
-        confirmed_context = "None (user denied prior occurrence or no confirmation provided)"
-        
-        if user_confirmation == "yes":
-            relevant_memory_chunks = structured_memory.get_relevant_history(user_id, combined_input)
-            raw_memory = structured_memory.summarize_memory(relevant_memory_chunks)
-            
-            if raw_memory and raw_memory != "No relevant past context found.":
-                confirmed_context = await call_llm_with_fallback(
-                    messages=[
-                        {"role": "system", "content": PROMPT_MEMORY_SELECTOR.format(
-                            user_input=combined_input,
-                            user_confirmation=user_confirmation,
-                            past_data=raw_memory
-                        )}
-                    ],
-                    use_primary=False, # Memory selection is simple, use smaller model
-                    allow_fallback=use_llm_fallback
-                )
+        # --- STEP 5: Contextual Memory Selection (Memory Selector) - issued alongside the controller in STEP 3 ---
+        if "memory" in call_results:
+            memory_response = call_results["memory"]
+            if isinstance(memory_response, BaseException):
+                if rag_task is not None:
+                    rag_task.cancel()
+                raise memory_response
+            confirmed_context = memory_response
 
         # --- STEP 6: Evidence Retrieval (RAG Router) ---
         rag_data = "No specific reference data found. Use general medical knowledge for terminology."
-        if rag_service.enabled:
-            # Use RAG router for query augmentation and dataset routing
-            search_query = rag_router.augment_query(combined_input, intent_enum)
-            print(f"🔍 Augmented query: {search_query[:100]}...")
-            
-            # Search using confirmed context + current input
-            if "Relevant memory included" in confirmed_context:
-                search_query += " " + confirmed_context
-                
-            # Retrieve with higher top_k, then filter by allowed datasets
-            docs = rag_service.search(search_query, top_k=12)
+        answer_evidence = frozenset()
+        if use_retrieval:
+            if rag_task is not None:
+                docs = await rag_task
+            else:
+                # Retrieve with higher top_k, then filter by allowed datasets
+                if "Relevant memory included" in confirmed_context:
+                    # Search the current input and the memory-augmented input separately and merge,
+                    # rather than embedding one concatenated string that dilutes both
+                    result_lists = await asyncio.gather(
+                        asyncio.to_thread(rag_service.search, search_query, top_k=8),
+                        asyncio.to_thread(rag_service.search, f"{search_query} {confirmed_context}", top_k=8)
+                    )
+                    docs = rag_service.merge_results(result_lists, top_k=12)
+                else:
+                    docs = await asyncio.to_thread(rag_service.search, search_query, top_k=12)
+            answer_evidence = evidence_signature(docs)
             
             # Filter results based on intent-specific dataset routing
             allowed_datasets = rag_router.get_dataset_routing(intent_enum)
@@ -829,40 +1141,38 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                     DatasetType.MEDLINEPLUS,
                     DatasetType.WHO_NHS
                 ]
-                print("🛡️ REPORT ANALYSIS: Restricting sources to MedlinePlus/WHO/NHS only")
+                logger.debug("🛡️ REPORT ANALYSIS: Restricting sources to MedlinePlus/WHO/NHS only")
                 
             docs = rag_router.filter_results_by_dataset(docs, allowed_datasets)
-            print(f"📊 Retrieved {len(docs)} results from allowed datasets: {[d.name for d in allowed_datasets]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📊 Retrieved %d results from allowed datasets: %s", len(docs), [d.name for d in allowed_datasets])
             
             # Validate retrieval quality
             is_valid, reason = rag_router.validate_retrieval_quality(docs, intent_enum)
             if not is_valid:
-                print(f"⚠️ Retrieval quality check failed: {reason}")
+                logger.warning("⚠️ Retrieval quality check failed: %s", reason)
             if docs:
-                rag_data = ""
-                has_symptom_data = False
-                for d in docs:
-                    # Basic cleaning to remove potential encoding artifacts
-                    cleaned_text = d['text'].encode('ascii', 'ignore').decode('ascii')
-                    source_info = f"[{d['source']}]"
-                    if d.get('metadata', {}).get('category') == "Primary Symptom":
-                        source_info += " (PRIMARY SYMPTOM ENTRY)"
-                        has_symptom_data = True
-                    
-                    rag_data += f"- {source_info} {cleaned_text} (Title: {d['title']})\n"
+                primary = [d.get('metadata', {}).get('category') == "Primary Symptom" for d in docs]
+                has_symptom_data = any(primary)
+                # Basic cleaning to remove potential encoding artifacts
+                rag_data = "".join(
+                    f"- [{d['source']}]{' (PRIMARY SYMPTOM ENTRY)' if is_primary else ''} "
+                    f"{_ascii_only(d['text'])} (Title: {d['title']})\n"
+                    for d, is_primary in zip(docs, primary)
+                )
                 
                 # ENHANCED FALLBACK: If this is a symptom query but RAG didn't return symptom data, add fallback
                 if detected_intent == "symptom_based" and not has_symptom_data:
-                    fallback = get_symptom_fallback(combined_input)
+                    fallback = symptom_fallback
                     if fallback:
                         rag_data = f"[FALLBACK SYMPTOM DATA - Primary Source]\n{fallback}\n\n[Additional Context from Medical Database]\n{rag_data}"
-                        print(f"✅ Supplementing RAG data with symptom fallback for: {combined_input[:50]}...")
+                        logger.debug("✅ Supplementing RAG data with symptom fallback for: %s...", combined_input[:50])
             else:
                 # CRITICAL FALLBACK: Check for symptom fallback before failing
-                fallback = get_symptom_fallback(combined_input)
+                fallback = symptom_fallback
                 if fallback:
                     rag_data = f"[FALLBACK SYMPTOM DATA] {fallback}"
-                    print(f"✅ Using symptom fallback for query: {combined_input[:50]}...")
+                    logger.debug("✅ Using symptom fallback for query: %s...", combined_input[:50])
 
         # --- STEP 8: RETRIEVAL QUALITY CHECK ---
         # Before calling expensive LLM, check if we have sufficient context
@@ -873,51 +1183,44 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
             # For symptom queries, we need either RAG data or fallback
             if rag_data == "No verified medical information found for this specific query.":
                 # No RAG data - check if we have fallback
-                fallback = get_symptom_fallback(combined_input)
+                fallback = symptom_fallback
                 if fallback:
                     # Use fallback directly without LLM call (saves API cost)
-                    print(f"⚡ QUALITY CHECK: Using fallback directly, skipping LLM for: {combined_input[:50]}...")
-                    return json.dumps({
-                        "type": "health_report",
-                        "health_information": fallback,
-                        "possible_conditions": ["Various causes possible - not a diagnosis"],
-                        "reasoning_brief": "Providing general information about this symptom based on medical knowledge.",
-                        "recommended_next_steps": "Monitor your symptoms. Consult a healthcare professional if symptoms persist, worsen, or are accompanied by other concerning signs.",
-                        "ai_confidence": "High - General Symptom Information",
-                        "trusted_sources": ["Medical Knowledge Base", "MedlinePlus (NIH)"],
-                        "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
-                    })
+                    logger.debug("⚡ QUALITY CHECK: Using fallback directly, skipping LLM for: %s...", combined_input[:50])
+                    return _fill_shortcut(_FALLBACK_DIRECT_JSON, fallback)
                 else:
                     has_sufficient_context = False
 
         # --- STEP 7: Medical Report Generation (Medical RAG) ---
+        # Prompts whose instructions are static carry the request data in a separate user
+        # message, so the system prompt is an identical prefix across calls
+        prompt_input = None
         try:
             if is_report_analysis:
-                print("📝 Using PROMPT_REPORT_ANALYZER")
-                prompt_content = PROMPT_REPORT_ANALYZER.format(
+                logger.debug("📝 Using PROMPT_REPORT_ANALYZER")
+                prompt_content = PROMPT_REPORT_ANALYZER
+                prompt_input = REPORT_ANALYZER_INPUT_TMPL.format(
                     report_text=report_text,
                     user_context=confirmed_context,
                     rag_data=rag_data
                 )
             elif is_image_analysis:
-                print(f"🖼️ Routing Image Analysis: {image_desc[:100]}...")
+                logger.debug("🖼️ Routing Image Analysis: %s...", image_desc[:100])
                 
-                # 1. Modality Detection (Layer 1)
-                modality_response = await call_llm_with_fallback(
-                    messages=[{"role": "system", "content": PROMPT_MODALITY_DETECTOR.format(image_caption=image_desc)}],
-                    response_format={"type": "json_object"},
-                    allow_fallback=use_llm_fallback
-                )
+                # 1. Modality Detection (Layer 1) - issued alongside the controller in STEP 3
+                modality_response = call_results["modality"]
+                if isinstance(modality_response, BaseException):
+                    raise modality_response
                 
                 try:
-                    modality_data = json.loads(modality_response)
+                    modality_data = orjson.loads(modality_response)
                     modality = modality_data.get("modality", "unknown")
                     modality_confidence = modality_data.get("confidence", 0.0)
-                    print(f"🔍 Detected Modality: {modality} (Confidence: {modality_confidence})")
+                    logger.debug("🔍 Detected Modality: %s (Confidence: %s)", modality, modality_confidence)
                 except:
                     modality = "unknown"
                     modality_confidence = 0.0
-                    print("⚠️ Failed to parse modality response, defaulting to unknown")
+                    logger.warning("⚠️ Failed to parse modality response, defaulting to unknown")
 
                 # 2. Model Router (Layer 2) & Confidence Gate (Layer 4)
                 CONFIDENCE_THRESHOLD = 0.6 if use_confidence_scoring else 0.0
@@ -930,13 +1233,13 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                 
                 if escalation_reason and use_hitl_escalation:
                     # HITL Escalation (Layer 5)
-                    print(f"🚨 HITL Escalation Triggered: {escalation_reason}")
-                    prompt_content = PROMPT_HITL_ESCALATION.format(escalation_reason=escalation_reason)
+                    logger.warning("🚨 HITL Escalation Triggered: %s", escalation_reason)
+                    prompt_content = HITL_ESCALATION_TMPL.format(escalation_reason=escalation_reason)
                 elif escalation_reason and not use_hitl_escalation:
                     # HITL is disabled, but we have an escalation reason. 
                     # Fallback to a safe general analysis instead of the specific HITL prompt.
-                    print(f"⚠️ HITL Disabled but escalation reason exists: {escalation_reason}. Falling back to general analysis.")
-                    prompt_content = PROMPT_MEDICAL_RAG.format(
+                    logger.warning("⚠️ HITL Disabled but escalation reason exists: %s. Falling back to general analysis.", escalation_reason)
+                    prompt_content = MEDICAL_RAG_TMPL.format(
                         user_query=combined_input,
                         user_context=confirmed_context,
                         rag_data=rag_data
@@ -944,36 +1247,37 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                 else:
                     # Route to Expert Model (Layer 3)
                     if modality == "radiology":
-                        print("🩻 Using PROMPT_RADIOLOGY_SPECIALIST")
-                        prompt_content = PROMPT_RADIOLOGY_SPECIALIST.format(
+                        logger.debug("🩻 Using PROMPT_RADIOLOGY_SPECIALIST")
+                        prompt_content = RADIOLOGY_SPECIALIST_TMPL.format(
                             image_caption=image_desc,
                             user_context=confirmed_context,
                             rag_data=rag_data
                         )
                     elif modality == "dermatology":
-                        print("🧴 Using PROMPT_SKIN_SPECIALIST")
-                        prompt_content = PROMPT_SKIN_SPECIALIST.format(
+                        logger.debug("🧴 Using PROMPT_SKIN_SPECIALIST")
+                        prompt_content = SKIN_SPECIALIST_TMPL.format(
                             image_caption=image_desc,
                             user_context=confirmed_context,
                             rag_data=rag_data
                         )
                     elif modality == "ophthalmology":
-                        print("👁️ Using PROMPT_EYE_SPECIALIST")
-                        prompt_content = PROMPT_EYE_SPECIALIST.format(
+                        logger.debug("👁️ Using PROMPT_EYE_SPECIALIST")
+                        prompt_content = EYE_SPECIALIST_TMPL.format(
                             image_caption=image_desc,
                             user_context=confirmed_context,
                             rag_data=rag_data
                         )
                     elif modality == "medical_document":
-                        print("📄 Routing to Report Analysis Prompt")
-                        prompt_content = PROMPT_REPORT_ANALYZER.format(
+                        logger.debug("📄 Routing to Report Analysis Prompt")
+                        prompt_content = PROMPT_REPORT_ANALYZER
+                        prompt_input = REPORT_ANALYZER_INPUT_TMPL.format(
                             report_text=image_desc,
                             user_context=confirmed_context,
                             rag_data=rag_data
                         )
                     else:
-                        print("🚨 Fallback to HITL for unhandled modality")
-                        prompt_content = PROMPT_HITL_ESCALATION.format(escalation_reason="Unhandled modality type.")
+                        logger.warning("🚨 Fallback to HITL for unhandled modality")
+                        prompt_content = HITL_ESCALATION_TMPL.format(escalation_reason="Unhandled modality type.")
 
                 # Audit Log Modality (Layer 6)
                 await audit_logger.log_event(
@@ -988,22 +1292,25 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                     }
                 )
             else:
-                print("🏥 Using PROMPT_MEDICAL_RAG")
-                prompt_content = PROMPT_MEDICAL_RAG.format(
+                logger.debug("🏥 Using PROMPT_MEDICAL_RAG")
+                prompt_content = MEDICAL_RAG_TMPL.format(
                     user_query=combined_input,
                     user_context=confirmed_context,
                     rag_data=rag_data
                 )
                 
+            final_messages = [{"role": "system", "content": prompt_content}]
+            if prompt_input is not None:
+                final_messages.append({"role": "user", "content": prompt_input})
             final_response_content = await call_llm_with_fallback(
-                messages=[
-                    {"role": "system", "content": prompt_content}
-                ],
+                messages=final_messages,
                 response_format={"type": "json_object"},
                 use_primary=True, # Use big model for final analysis, fallback if needed
                 allow_fallback=use_llm_fallback
             )
-            # --- STEP 8: Feedback Refinement (Handled by feedback_router.py) ---
+            if answer_cache_scope is not None:
+                semantic_cache.store(norm_query, answer_cache_scope, final_response_content, query_vector, answer_evidence)
+            # --- STEP 8: User feedback is collected separately (feedback_router.py -> user_feedback) ---
             await audit_logger.log_event(
                 action="AI_QUERY",
                 status="SUCCESS",
@@ -1023,7 +1330,13 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
             )
             return final_response_content
         except Exception as e:
-            print(f"❌ Final RAG Error: {e}")
+            # One queued record; the traceback is only formatted at DEBUG, since bursts of transient
+            # provider errors (429s) would otherwise pay for a full stack format per request
+            logger.error(
+                "❌ Final RAG Error (%s): %s | Query was: %s",
+                type(e).__name__, e, combined_input[:100],
+                exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
             await audit_logger.log_event(
                 action="AI_QUERY",
                 status="FAILURE",
@@ -1031,31 +1344,13 @@ async def run_clinical_analysis(profile: dict, history: list[dict], inputs: dict
                 request=request,
                 metadata={"error": str(e), "model": LLM_MODEL}
             )
-            print(f"❌ Error type: {type(e).__name__}")
-            print(f"❌ Query was: {combined_input[:100]}")
-            import traceback
-            traceback.print_exc()
             
             # LAST RESORT FALLBACK: Try symptom fallback even if LLM fails
-            fallback = get_symptom_fallback(combined_input)
+            fallback = symptom_fallback
             if fallback:
-                return json.dumps({
-                    "type": "health_report",
-                    "health_information": fallback,
-                    "possible_conditions": ["Various causes possible"],
-                    "reasoning_brief": "Using general symptom information due to system limitations.",
-                    "recommended_next_steps": "Consult a healthcare professional for personalized advice.",
-                    "ai_confidence": "Medium - General Information",
-                    "trusted_sources": ["Medical Knowledge Base"],
-                    "disclaimer": "This is for informational purposes and not a diagnosis. Consult a professional."
-                })
+                return _fill_shortcut(_FALLBACK_LAST_RESORT_JSON, fallback)
             
-            return json.dumps({
-                "type": "health_report",
-                "health_information": "I encountered an error while processing your request. Please try again or consult a professional.",
-                "ai_confidence": "Low - System Error",
-                "disclaimer": "This is not a diagnosis. Consult a professional."
-            })
+            return _ERR_ANALYSIS_FAILED
     finally:
         db.close()
 
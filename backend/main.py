@@ -1,5 +1,6 @@
 # backend/main.py
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from .database import engine, Base
@@ -9,19 +10,21 @@ from .report_router import router as report_router
 from .security_router import router as security_router
 from .feedback_router import router as feedback_router
 from .owner_router import router as owner_router
-from . import query_service, dashboard_service  
+from . import query_service, dashboard_service, llm_service
 from . import models  
 import os
 import time
 from fastapi import Request
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from .audit_logger import audit_logger
+from .email_service import email_service
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 # Rate limiting
 limiter = Limiter(key_func=get_remote_address)
-app = FastAPI(title="AI Health Assistant API")
+# orjson serializes every JSON response (faster than the stdlib encoder on dict-heavy payloads)
+app = FastAPI(title="AI Health Assistant API", default_response_class=ORJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -68,6 +71,35 @@ async def audit_log_middleware(request: Request, call_next):
             
     return response
 
+# Audit log batching lifecycle
+@app.on_event("startup")
+async def start_audit_logger():
+    audit_logger.start()
+
+@app.on_event("shutdown")
+async def stop_audit_logger():
+    # Flush any buffered audit events before the process exits
+    await audit_logger.shutdown()
+
+# Pooled SMTP senders for outbound email
+@app.on_event("startup")
+async def start_email_service():
+    email_service.start()
+
+@app.on_event("shutdown")
+async def stop_email_service():
+    # Deliver queued emails and close SMTP connections
+    await email_service.shutdown()
+
+# Shared Groq client: warm its connection pool before traffic, close it on exit
+@app.on_event("startup")
+async def start_llm_client():
+    await llm_service.warm_up_llm()
+
+@app.on_event("shutdown")
+async def stop_llm_client():
+    await llm_service.close_llm()
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(profile_router)
@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Index, text
 from datetime import datetime
 from .database import Base
 
@@ -32,6 +32,11 @@ class UserFeedback(Base):
     confidence_score = Column(Float, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # One feedback per answered query; guest/unlinked feedback (NULL) is unrestricted
+        Index("uq_user_feedback_query_id", "query_id", unique=True, postgresql_where=text("query_id IS NOT NULL")),
+    )
+
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
     id = Column(Integer, primary_key=True, index=True)
@@ -67,6 +72,11 @@ class AuditLog(Base):
     user_agent = Column(String, nullable=True)
     metadata_json = Column(JSON, nullable=True)
 
+    __table_args__ = (
+        # Filtered, newest-first audit listings
+        Index("idx_auditlog_action_ts", "action", "timestamp"),
+    )
+
 class ChangePasswordTOTP(Base):
     __tablename__ = "change_password_totp"
     id = Column(Integer, primary_key=True, index=True)
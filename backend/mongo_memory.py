@@ -1,6 +1,8 @@
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+import threading
 from pymongo import MongoClient
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,14 +10,12 @@ load_dotenv()
 # --- Initialize MongoDB Client ---
 MONGO_URI = os.getenv("MONGO_URI")
 memory_collection = None
-feedback_collection = None
 analytics_collection = None
 if MONGO_URI:
     try:
         client = MongoClient(MONGO_URI)
         db = client["Health_Assistant"]
         memory_collection = db["Health_Memory"]
-        feedback_collection = db["Health_Feedback"]
         analytics_collection = db["Health_Analytics"]
         print("✅ MongoDB client initialized.")
     except Exception as e:
@@ -23,6 +23,37 @@ if MONGO_URI:
 else:
     print("⚠️ WARNING: MONGO_URI not found! Memory service disabled.")
 
+# Every history read is "one user's newest N messages": this index serves it as a
+# bounded seek instead of an in-memory sort over the user's whole history
+if memory_collection is not None:
+    try:
+        memory_collection.create_index([("user_id", 1), ("timestamp", -1)])
+        analytics_collection.create_index([("timestamp", -1)])
+    except Exception as e:
+        print(f"⚠️ WARNING: Could not ensure MongoDB indexes. Error: {e}")
+
+# Dashboard history cache, keyed on (user_id, limit). Entries are served as-is for 30s and
+# dropped whenever this process writes to or clears the user's history. After that, one
+# indexed point query on the newest timestamp decides whether the snapshot is still current.
+_history_cache = TTLCache(maxsize=10_000, ttl=30)
+_history_snapshots = TTLCache(maxsize=10_000, ttl=600)
+_history_lock = threading.Lock()
+
+def _invalidate_history(user_id: str):
+    with _history_lock:
+        for cache in (_history_cache, _history_snapshots):
+            for key in [k for k in cache.keys() if k[0] == user_id]:
+                cache.pop(key, None)
+
+def get_latest_message_ts(user_id: str):
+    """Returns the timestamp of the user's newest message (index-backed point query)."""
+    if memory_collection is None: return None
+    doc = memory_collection.find_one(
+        {"user_id": user_id},
+        projection={"timestamp": 1, "_id": 0},
+        sort=[("timestamp", -1)]
+    )
+    return doc["timestamp"] if doc else None
 
 def store_message(user_id: str, role: str, content: str) -> str:
     """Stores a message in the user's conversation history. Returns the string ID."""
@@ -34,24 +65,36 @@ def store_message(user_id: str, role: str, content: str) -> str:
             "content": content,
             "timestamp": datetime.now(timezone.utc)
         })
+        _invalidate_history(user_id)
         return str(result.inserted_id)
     except Exception as e:
         print(f"❌ ERROR: Failed to store message in MongoDB. Error: {e}")
         return None
 
-def log_feedback(user_id: str, rating: str, comment: str = None, context: str = None):
-    """Logs user feedback (helpful/not helpful)."""
-    if feedback_collection is None: return
-    try:
-        feedback_collection.insert_one({
+def store_messages(user_id: str, messages: list) -> list:
+    """
+    Stores several (role, content) messages for one user in a single insert_many round-trip.
+    Returns the string IDs in input order (None for each on failure).
+    """
+    if memory_collection is None: return [None] * len(messages)
+    now = datetime.now(timezone.utc)
+    # Strictly increasing timestamps keep the turn order stable when history is sorted
+    docs = [
+        {
             "user_id": user_id,
-            "rating": rating, # "positive" or "negative"
-            "comment": comment,
-            "context": context,
-            "timestamp": datetime.now(timezone.utc)
-        })
+            "role": role,
+            "content": content,
+            "timestamp": now + timedelta(microseconds=i)
+        }
+        for i, (role, content) in enumerate(messages)
+    ]
+    try:
+        result = memory_collection.insert_many(docs, ordered=True)
+        _invalidate_history(user_id)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
     except Exception as e:
-        print(f"❌ ERROR: Failed to log feedback. Error: {e}")
+        print(f"❌ ERROR: Failed to store messages in MongoDB. Error: {e}")
+        return [None] * len(messages)
 
 def log_analytics(event_type: str, details: dict):
     """Logs system events for analysis (e.g., Escalation triggered)."""
@@ -76,7 +119,7 @@ def get_user_memory(user_id: str, limit: int = 10) -> list:
         ).sort("timestamp", -1).limit(limit))
         
         # Reverse the results so they are in chronological order (Oldest -> Newest)
-        return list(reversed(messages))
+        return messages[::-1]
     except Exception as e:
         print(f"❌ ERROR: Failed to retrieve user memory from MongoDB. Error: {e}")
         return []
@@ -84,11 +127,24 @@ def get_user_memory(user_id: str, limit: int = 10) -> list:
 def get_full_history_for_dashboard(user_id: str, limit: int = 100) -> list:
     """Retrieves full history with timestamps for the dashboard view, in chronological order (Oldest -> Newest)."""
     if memory_collection is None: return []
+    key = (user_id, limit)
+    with _history_lock:
+        cached = _history_cache.get(key)
+        snapshot = _history_snapshots.get(key)
+    if cached is not None:
+        return cached
     try:
+        # Unchanged since the last full read? Reuse it without re-scanning
+        if snapshot is not None and snapshot[0] == get_latest_message_ts(user_id):
+            with _history_lock:
+                _history_cache[key] = snapshot[1]
+            return snapshot[1]
+
         # Step 1: Get the latest N messages (descending order)
         messages = list(memory_collection.find(
             {"user_id": user_id}
         ).sort("timestamp", -1).limit(limit))
+        latest_ts = messages[0]["timestamp"] if messages else None
         
         # Step 2: Convert ObjectId to string for JSON serialization
         for msg in messages:
@@ -97,7 +153,11 @@ def get_full_history_for_dashboard(user_id: str, limit: int = 100) -> list:
         
         # Step 3: Reverse them to restore chronological order (Oldest -> Newest)
         # This ensures the oldest message is at the top [0] and newest at the bottom [last]
-        return list(reversed(messages))
+        history = messages[::-1]
+        with _history_lock:
+            _history_cache[key] = history
+            _history_snapshots[key] = (latest_ts, history)
+        return history
     except Exception as e:
         print(f"❌ ERROR: Failed to retrieve dashboard history from MongoDB. Error: {e}")
         return []
@@ -107,6 +167,7 @@ def clear_user_memory(user_id: str):
     if memory_collection is None: return
     try:
         memory_collection.delete_many({"user_id": user_id})
+        _invalidate_history(user_id)
         print(f"✅ Memory cleared for user: {user_id}")
     except Exception as e:
         print(f"❌ ERROR: Failed to clear user memory. Error: {e}")
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_, or_, String
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
-from .database import get_db
+from .database import get_db, get_db_readonly
 from .models import User, UserFeedback, AuditLog, SystemConfig
 from .auth import get_current_owner
 from .audit_logger import audit_logger
@@ -223,7 +223,7 @@ async def get_audit_logs(
     offset: int = 0,
     action: str = None,
     status: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_readonly),
     owner: User = Depends(get_current_owner)
 ):
     """
@@ -1,4 +1,5 @@
-import json
+import asyncio
+import orjson
 from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Request
 from typing import Optional, List
 from PIL import Image
@@ -104,7 +105,7 @@ def analyze_image_with_mediclip(image: Image.Image) -> str:
 
 
 # --- NEW UNIFIED MULTIMODAL ENDPOINT ---
-@router.post("/multimodal")
+@router.post("/multimodal", dependencies=[Depends(llm_service.require_llm)])
 @limiter.limit("10/minute")
 async def handle_multimodal_query(
     request: Request,
@@ -127,7 +128,7 @@ async def handle_multimodal_query(
 
     # 1. Process Voice Input (if provided)
     if audio_file:
-        transcribed_text = speech_service.speech_to_text(audio_file)
+        transcribed_text = await speech_service.speech_to_text(audio_file)
         if transcribed_text.startswith("[stt_error]"):
             raise HTTPException(status_code=500, detail=f"Speech-to-Text failed: {transcribed_text}")
         prompt_parts.append(f"The user said: '{transcribed_text}'.")
@@ -185,7 +186,8 @@ async def handle_multimodal_query(
 
     # 6. Assemble Inputs and get LLM response
     final_prompt = " ".join(prompt_parts) # Still used for storing simple history
-    history = mongo_memory.get_user_memory(user_id_str)
+    # Mongo reads/writes are blocking pymongo calls, kept off the event loop
+    history = await asyncio.to_thread(mongo_memory.get_user_memory, user_id_str)
     
     inputs = {
         "text_query": text_query,
@@ -205,7 +207,7 @@ async def handle_multimodal_query(
     # Heuristic: If user used voice OR explicitly asked, generate audio.
     # For now, let's always generate it if the response is valid JSON, to show off the feature.
     try:
-        response_data = json.loads(text_response)
+        response_data = orjson.loads(text_response)
         text_to_speak = ""
         
         if response_data.get("type") == "clarification_questions":
@@ -241,9 +243,10 @@ async def handle_multimodal_query(
     except Exception as e:
         print(f"⚠️ TTS Generation failed: {e}")
 
-    # 8. Store the conversation
-    mongo_memory.store_message(user_id_str, "user", final_prompt)
-    query_id = mongo_memory.store_message(user_id_str, "assistant", text_response)
+    # 8. Store the conversation (both turns in one round-trip)
+    _, query_id = await asyncio.to_thread(
+        mongo_memory.store_messages, user_id_str, [("user", final_prompt), ("assistant", text_response)]
+    )
 
     # 9. Return all relevant data to the frontend
     return {
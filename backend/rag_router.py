@@ -15,6 +15,32 @@ from typing import Dict, List, Any, Optional, Tuple
 from enum import Enum
 import re
 
+# "symptoms of <disease>"-style phrasing (informational, never a personal symptom report).
+# Single source for these phrases: llm_service builds its shortcut matcher from the same tuple,
+# so the symptom-shortcut and follow-up rules cannot drift apart.
+DISEASE_SYMPTOM_PATTERNS = (
+    "symptoms of", "symptoms for", "what are the symptoms",
+    "signs of", "signs and symptoms"
+)
+# One alternation replaces five substring scans
+_DISEASE_SYMPTOM_RE = re.compile("|".join(map(re.escape, DISEASE_SYMPTOM_PATTERNS)))
+
+# Whole-message small talk (greetings, thanks, sign-offs) that medical retrieval cannot help with
+_SMALL_TALK_RE = re.compile(
+    r"(?:hi|hello|hey|good (?:morning|afternoon|evening)|how are you|thanks?|thank you|"
+    r"ok(?:ay)?|bye|goodbye|see you)(?: (?:there|so much|a lot|again|doctor|doc))?[\s!.,?]*"
+)
+
+# Vague personal complaints that always warrant one clarifying question
+_VAGUE_SYMPTOM_RE = re.compile(
+    r"i don't feel well|something is wrong|i feel bad|not feeling good|i am sick|feeling unwell"
+)
+
+# First-person symptom reports ("I have ...", "I'm feeling ...")
+_FIRST_PERSON_SYMPTOM_RE = re.compile(
+    r"i have|i feel|i'm feeling|i am feeling|experiencing|suffering from"
+)
+
 class QueryIntent(Enum):
     """Primary query intent types with strict priority ordering"""
     SYMPTOM_QUERY = 1          # Highest priority
@@ -35,6 +61,46 @@ class DatasetType(Enum):
     PUBMED = "pubmed"                      # Research abstracts
 
 
+# Intent -> datasets to query, in priority order (first = highest priority)
+_DATASET_ROUTING = {
+    QueryIntent.SYMPTOM_QUERY: [
+        DatasetType.SYMPTOM_FALLBACK,  # Primary
+        DatasetType.MEDLINEPLUS,        # Secondary
+        DatasetType.WHO_NHS             # Tertiary
+    ],
+    QueryIntent.DRUG_INTERACTION_QUERY: [
+        DatasetType.DRUG_INTERACTIONS   # Only drug interaction data
+    ],
+    QueryIntent.TEST_OR_REPORT_QUERY: [
+        DatasetType.MEDLINEPLUS,        # Primary
+        DatasetType.WHO_NHS             # Secondary
+    ],
+    QueryIntent.DISEASE_QUERY: [
+        DatasetType.MEDLINEPLUS,        # Primary (patient education)
+        DatasetType.WHO_NHS,            # Secondary (patient education)
+        DatasetType.ICD11               # Fallback (taxonomy only)
+    ],
+    QueryIntent.RESEARCH_QUERY: [
+        DatasetType.PUBMED              # Only research data
+    ],
+    QueryIntent.UNKNOWN: [
+        DatasetType.MEDLINEPLUS,        # Default to patient education
+        DatasetType.WHO_NHS,
+        DatasetType.ICD11
+    ]
+}
+_DEFAULT_ROUTING = [DatasetType.MEDLINEPLUS]
+
+# Intent -> retrieval keywords prepended to the user's query
+_QUERY_AUGMENTATION = {
+    QueryIntent.SYMPTOM_QUERY: "symptom causes treatment management",
+    QueryIntent.DRUG_INTERACTION_QUERY: "drug interaction safety warning",
+    QueryIntent.TEST_OR_REPORT_QUERY: "test results interpretation normal range",
+    QueryIntent.DISEASE_QUERY: "disease condition overview causes symptoms",
+    QueryIntent.RESEARCH_QUERY: "research study clinical evidence"
+}
+
+
 class RAGRouter:
     """
     Enterprise-grade RAG routing controller with anti-loop guarantees.
@@ -113,6 +179,12 @@ class RAGRouter:
         r"what does research say"
     ]
     
+    # Each pattern list compiled once as a single alternation ("any pattern matches")
+    _DISEASE_RE = re.compile("|".join(DISEASE_PATTERNS))
+    _DRUG_RE = re.compile("|".join(DRUG_PATTERNS))
+    _TEST_RE = re.compile("|".join(TEST_PATTERNS))
+    _RESEARCH_RE = re.compile("|".join(RESEARCH_PATTERNS))
+    
     def __init__(self):
         """Initialize RAG router with configuration"""
         self.max_follow_ups = 1  # Enterprise standard: max 1 follow-up
@@ -165,48 +237,23 @@ class RAGRouter:
                 return True
         
         # Check for "I have/feel" patterns
-        symptom_patterns = [
-            r"i have",
-            r"i feel",
-            r"i'm feeling",
-            r"i am feeling",
-            r"experiencing",
-            r"suffering from"
-        ]
-        
-        for pattern in symptom_patterns:
-            if re.search(pattern, query_lower):
-                return True
-        
-        return False
+        return bool(_FIRST_PERSON_SYMPTOM_RE.search(query_lower))
     
     def _is_drug_query(self, query_lower: str) -> bool:
         """Check if query is about drug interactions"""
-        for pattern in self.DRUG_PATTERNS:
-            if re.search(pattern, query_lower):
-                return True
-        return False
+        return bool(self._DRUG_RE.search(query_lower))
     
     def _is_test_query(self, query_lower: str) -> bool:
         """Check if query is about tests or reports"""
-        for pattern in self.TEST_PATTERNS:
-            if re.search(pattern, query_lower):
-                return True
-        return False
+        return bool(self._TEST_RE.search(query_lower))
     
     def _is_disease_query(self, query_lower: str) -> bool:
         """Check if query is about a disease/condition"""
-        for pattern in self.DISEASE_PATTERNS:
-            if re.search(pattern, query_lower):
-                return True
-        return False
+        return bool(self._DISEASE_RE.search(query_lower))
     
     def _is_research_query(self, query_lower: str) -> bool:
         """Check if query is about research/studies"""
-        for pattern in self.RESEARCH_PATTERNS:
-            if re.search(pattern, query_lower):
-                return True
-        return False
+        return bool(self._RESEARCH_RE.search(query_lower))
     
     def should_use_symptom_shortcut(self, query: str, intent: QueryIntent) -> bool:
         """
@@ -230,12 +277,7 @@ class RAGRouter:
         query_lower = query.lower()
         
         # Check if asking about disease symptoms (should NOT use shortcut)
-        disease_symptom_patterns = [
-            "symptoms of", "symptoms for", "what are the symptoms",
-            "signs of", "signs and symptoms"
-        ]
-        
-        if any(pattern in query_lower for pattern in disease_symptom_patterns):
+        if _DISEASE_SYMPTOM_RE.search(query_lower):
             return False
         
         # Check if symptom is common
@@ -245,6 +287,24 @@ class RAGRouter:
         
         return False
     
+    def needs_retrieval(self, query: str, intent: QueryIntent) -> bool:
+        """
+        Decide whether evidence retrieval can help answer this query.
+        
+        Only unclassified small talk ("hi", "thanks!") skips retrieval; every classified
+        medical intent, and any unclassified question, still retrieves.
+        
+        Args:
+            query: User's query text
+            intent: Detected intent
+            
+        Returns:
+            True if the RAG search should run, False otherwise
+        """
+        if intent != QueryIntent.UNKNOWN:
+            return True
+        return not _SMALL_TALK_RE.fullmatch(query.lower().strip())
+    
     def get_dataset_routing(self, intent: QueryIntent) -> List[DatasetType]:
         """
         Get ordered list of datasets to query based on intent.
@@ -257,35 +317,8 @@ class RAGRouter:
         Returns:
             List of DatasetType in priority order
         """
-        routing_map = {
-            QueryIntent.SYMPTOM_QUERY: [
-                DatasetType.SYMPTOM_FALLBACK,  # Primary
-                DatasetType.MEDLINEPLUS,        # Secondary
-                DatasetType.WHO_NHS             # Tertiary
-            ],
-            QueryIntent.DRUG_INTERACTION_QUERY: [
-                DatasetType.DRUG_INTERACTIONS   # Only drug interaction data
-            ],
-            QueryIntent.TEST_OR_REPORT_QUERY: [
-                DatasetType.MEDLINEPLUS,        # Primary
-                DatasetType.WHO_NHS             # Secondary
-            ],
-            QueryIntent.DISEASE_QUERY: [
-                DatasetType.MEDLINEPLUS,        # Primary (patient education)
-                DatasetType.WHO_NHS,            # Secondary (patient education)
-                DatasetType.ICD11               # Fallback (taxonomy only)
-            ],
-            QueryIntent.RESEARCH_QUERY: [
-                DatasetType.PUBMED              # Only research data
-            ],
-            QueryIntent.UNKNOWN: [
-                DatasetType.MEDLINEPLUS,        # Default to patient education
-                DatasetType.WHO_NHS,
-                DatasetType.ICD11
-            ]
-        }
-        
-        return routing_map.get(intent, [DatasetType.MEDLINEPLUS])
+        # Shared per-intent list: callers must not mutate it
+        return _DATASET_ROUTING.get(intent, _DEFAULT_ROUTING)
     
     def augment_query(self, query: str, intent: QueryIntent) -> str:
         """
@@ -298,15 +331,7 @@ class RAGRouter:
         Returns:
             Augmented query string
         """
-        augmentation_map = {
-            QueryIntent.SYMPTOM_QUERY: "symptom causes treatment management",
-            QueryIntent.DRUG_INTERACTION_QUERY: "drug interaction safety warning",
-            QueryIntent.TEST_OR_REPORT_QUERY: "test results interpretation normal range",
-            QueryIntent.DISEASE_QUERY: "disease condition overview causes symptoms",
-            QueryIntent.RESEARCH_QUERY: "research study clinical evidence"
-        }
-        
-        augmentation = augmentation_map.get(intent, "")
+        augmentation = _QUERY_AUGMENTATION.get(intent, "")
         
         if augmentation:
             return f"{augmentation} {query}"
@@ -401,11 +426,7 @@ class RAGRouter:
                     return False  # Already asked recently, don't loop
         
         # Rule 2: NEVER ask for disease symptom queries (they are informational)
-        disease_symptom_patterns = [
-            "symptoms of", "symptoms for", "what are the symptoms",
-            "signs of", "signs and symptoms"
-        ]
-        if any(pattern in query_lower for pattern in disease_symptom_patterns):
+        if _DISEASE_SYMPTOM_RE.search(query_lower):
             return False
         
         # Rule 3: Check for brevity and lack of context
@@ -418,18 +439,8 @@ class RAGRouter:
             return True
             
         # Rule 4: Vague personal symptoms always need clarification
-        vague_patterns = [
-            r"i don't feel well",
-            r"something is wrong",
-            r"i feel bad",
-            r"not feeling good",
-            r"i am sick",
-            r"feeling unwell"
-        ]
-        
-        for pattern in vague_patterns:
-            if re.search(pattern, query_lower):
-                return True
+        if _VAGUE_SYMPTOM_RE.search(query_lower):
+            return True
         
         # Rule 5: If it's a common symptom but no context provided, allow one follow-up
         if self.should_use_symptom_shortcut(query, intent) and word_count < 4:
@@ -455,7 +466,8 @@ class RAGRouter:
         if not allowed_datasets:
             return results
         
-        allowed_dataset_names = {ds.value for ds in allowed_datasets}
+        allowed = frozenset(allowed_datasets)
+        allowed_dataset_names = frozenset(ds.value for ds in allowed)
         
         filtered = []
         for result in results:
@@ -468,15 +480,15 @@ class RAGRouter:
             # Map source to dataset type
             if dataset in allowed_dataset_names:
                 filtered.append(result)
-            elif 'medlineplus' in source and DatasetType.MEDLINEPLUS in allowed_datasets:
+            elif 'medlineplus' in source and DatasetType.MEDLINEPLUS in allowed:
                 filtered.append(result)
-            elif 'who' in source or 'nhs' in source and DatasetType.WHO_NHS in allowed_datasets:
+            elif 'who' in source or 'nhs' in source and DatasetType.WHO_NHS in allowed:
                 filtered.append(result)
-            elif 'icd' in source and DatasetType.ICD11 in allowed_datasets:
+            elif 'icd' in source and DatasetType.ICD11 in allowed:
                 filtered.append(result)
-            elif 'drug interaction' in source and DatasetType.DRUG_INTERACTIONS in allowed_datasets:
+            elif 'drug interaction' in source and DatasetType.DRUG_INTERACTIONS in allowed:
                 filtered.append(result)
-            elif 'pubmed' in source and DatasetType.PUBMED in allowed_datasets:
+            elif 'pubmed' in source and DatasetType.PUBMED in allowed:
                 filtered.append(result)
         
         return filtered
@@ -113,25 +113,26 @@ def seed_database():
         print("❌ RAG Service is not enabled (Check API Key or Dependencies).")
         return
 
-    count = 0
+    docs = []
     for item in TRUSTED_DATA:
         # Create a unique ID based on title and source
         doc_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{item['source']}-{item['title']}"))
-        
-        # Upsert
-        rag_service.upsert_document(
-            doc_id=doc_id,
-            text=item["text"],
-            metadata={
+        docs.append((
+            doc_id,
+            item["text"],
+            {
                 "source": item["source"],
                 "title": item["title"],
                 "category": item.get("category", "General"),
                 "text": item["text"]
             }
-        )
-        count += 1
+        ))
         print(f"   - Indexed: [{item['source']}] {item['title']}")
     
+    # Upsert in a single batched embed + upsert
+    rag_service.upsert_many(docs)
+    count = len(docs)
+    
     print(f"✅ Seeding Complete. {count} documents indexed in Pinecone.")
 
 if __name__ == "__main__":
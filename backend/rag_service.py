@@ -1,6 +1,6 @@
 import os
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +9,7 @@ load_dotenv()
 RAG_ENABLED = False
 EMBEDDING_MODEL = None
 PINECONE_INDEX = None
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX", "health-assistant-medical-knowledge")
 
 try:
     from pinecone import Pinecone, ServerlessSpec
@@ -22,7 +23,7 @@ try:
 
     # 2. Initialize Pinecone
     api_key = os.getenv("PINECONE_API_KEY")
-    index_name = os.getenv("PINECONE_INDEX", "health-assistant-medical-knowledge")
+    index_name = PINECONE_INDEX_NAME
     
     if api_key:
         pc = Pinecone(api_key=api_key)
@@ -55,6 +56,29 @@ except Exception as e:
     print(f"❌ RAG Service Initialization Error: {e}")
 
 
+# Hard-Coded Source Priority:
+# 0. Primary Symptom (MedlinePlus) - Highest for symptom queries
+# 1. Drug Interaction (Safety)
+# 2. MedlinePlus & WHO/NHS (General Patient Education)
+# 3. ICD-11 (Taxonomy)
+# 4. PubMed (Research)
+# 5. Others
+def _source_priority(doc: Dict[str, Any]) -> int:
+    src = doc['source'].lower()
+    cat = doc.get('category', '').lower()
+    dataset = doc.get('metadata', {}).get('dataset', '').lower()
+    
+    if "primary symptom" in cat: return 0
+    if "drug interaction" in src: return 1
+    if "medlineplus" in src or dataset == "who_nhs": return 2
+    if "icd-11" in src or "icd11" in src: return 3
+    if "pubmed" in src: return 4
+    return 5
+
+def _rank_key(doc: Dict[str, Any]) -> Tuple[int, float]:
+    # Sort by priority first, then by semantic score
+    return (_source_priority(doc), -doc['score'])
+
 class RAGService:
     def __init__(self):
         self.enabled = RAG_ENABLED
@@ -67,14 +91,11 @@ class RAGService:
             return []
         return self.model.encode(text).tolist()
 
-    def upsert_document(self, doc_id: str, text: str, metadata: Dict[str, Any]):
+    @staticmethod
+    def validate_metadata(doc_id: str, metadata: Dict[str, Any]):
         """
-        Upserts a document into Pinecone.
-        
         CRITICAL: For new datasets (WHO_NHS, SNOMED_CT, UMLS), the 'dataset' field is MANDATORY.
-        This validation runs BEFORE checking if RAG is enabled to ensure data integrity.
         """
-        # Validate mandatory 'dataset' field for new datasets (BEFORE enabled check)
         role = metadata.get('role', '')
         if role in ['PatientEducation', 'Taxonomy', 'SemanticMapping']:
             if 'dataset' not in metadata:
@@ -90,6 +111,15 @@ class RAGService:
                     f"Invalid dataset value '{metadata['dataset']}' for document '{doc_id}'. "
                     f"Must be one of: {valid_datasets}"
                 )
+
+    def upsert_document(self, doc_id: str, text: str, metadata: Dict[str, Any]):
+        """
+        Upserts a document into Pinecone.
+        
+        This validation runs BEFORE checking if RAG is enabled to ensure data integrity.
+        """
+        # Validate mandatory 'dataset' field for new datasets (BEFORE enabled check)
+        self.validate_metadata(doc_id, metadata)
         
         if not self.enabled:
             return
@@ -104,6 +134,38 @@ class RAGService:
         except Exception as e:
             print(f"❌ Upsert Error: {e}")
 
+    def upsert_many(self, docs: List[Tuple[str, str, Dict[str, Any]]], batch_size: int = 64):
+        """
+        Upserts (doc_id, text, metadata) tuples with one batched embedding pass and
+        one Pinecone upsert per batch (Pinecone accepts up to 100 vectors per call).
+        Returns the ids actually written to Pinecone.
+        """
+        # Validate everything first so a bad record never leaves a half-written batch
+        for doc_id, _, metadata in docs:
+            self.validate_metadata(doc_id, metadata)
+        
+        if not self.enabled or not docs:
+            return []
+        
+        if self.mock_mode:
+            for doc_id, _, metadata in docs:
+                print(f"  - [MOCK] Indexed: {metadata.get('title', doc_id)} [dataset={metadata.get('dataset', 'N/A')}]")
+            return []
+        
+        written = []
+        for i in range(0, len(docs), batch_size):
+            batch = docs[i:i + batch_size]
+            try:
+                vectors = self.model.encode([text for _, text, _ in batch], batch_size=batch_size, convert_to_numpy=True)
+                self.index.upsert(vectors=[
+                    (doc_id, vector.tolist(), metadata)
+                    for (doc_id, _, metadata), vector in zip(batch, vectors)
+                ])
+                written.extend(doc_id for doc_id, _, _ in batch)
+            except Exception as e:
+                print(f"❌ Batch Upsert Error ({len(batch)} docs): {e}")
+        return written
+
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Retrieves relevant documents with hard-coded source priority ranking:
@@ -178,28 +240,8 @@ class RAGService:
                     "category": match['metadata'].get('category', '')
                 })
 
-            # 2. Apply Hard-Coded Source Priority
-            # Priority: 
-            # 0. Primary Symptom (MedlinePlus) - Highest for symptom queries
-            # 1. Drug Interaction (Safety)
-            # 2. MedlinePlus & WHO/NHS (General Patient Education)
-            # 3. ICD-11 (Taxonomy)
-            # 4. PubMed (Research)
-            # 5. Others
-            def get_priority(doc):
-                src = doc['source'].lower()
-                cat = doc.get('category', '').lower()
-                dataset = doc.get('metadata', {}).get('dataset', '').lower()
-                
-                if "primary symptom" in cat: return 0
-                if "drug interaction" in src: return 1
-                if "medlineplus" in src or dataset == "who_nhs": return 2
-                if "icd-11" in src or "icd11" in src: return 3
-                if "pubmed" in src: return 4
-                return 5
-
-            # Sort by priority first, then by semantic score
-            candidates.sort(key=lambda x: (get_priority(x), -x['score']))
+            # 2. Apply Hard-Coded Source Priority, then semantic score
+            candidates.sort(key=_rank_key)
 
             # 3. Return top_k after re-ranking
             return candidates[:top_k]
@@ -208,4 +250,17 @@ class RAGService:
             print(f"❌ Search Error: {e}")
             return []
 
+    def merge_results(self, result_lists: List[List[Dict[str, Any]]], top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Merges the results of several searches: documents are deduplicated on (source, title),
+        keeping the best-scoring copy, and re-ranked with the same source priority as search().
+        """
+        best: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for results in result_lists:
+            for doc in results:
+                key = (doc['source'], doc['title'])
+                if key not in best or doc['score'] > best[key]['score']:
+                    best[key] = doc
+        return sorted(best.values(), key=_rank_key)[:top_k]
+
 rag_service = RAGService()
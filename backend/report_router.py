@@ -1,7 +1,8 @@
 # backend/report_router.py
 from io import BytesIO
 import os
-import json
+import asyncio
+import orjson
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
@@ -280,7 +281,7 @@ async def generate_user_report(
 
     # 2. Fetch Latest Report from History
     # Note: mongo_memory.get_full_history_for_dashboard returns messages in chronological order (Oldest -> Newest).
-    full_history = mongo_memory.get_full_history_for_dashboard(str(current_user.id), limit=50)
+    full_history = await asyncio.to_thread(mongo_memory.get_full_history_for_dashboard, str(current_user.id), limit=50)
     
     raw_report = None
     if full_history:
@@ -289,7 +290,7 @@ async def generate_user_report(
             if msg.get("role") == "assistant":
                 try:
                     content = msg.get("content", "")
-                    parsed = json.loads(content)
+                    parsed = orjson.loads(content)
                     # Heuristic to check if it's a report
                     is_report = (
                         parsed.get("type") in ["health_report", "medical_report_analysis"] or
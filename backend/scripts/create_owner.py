@@ -7,7 +7,15 @@ from backend.database import SessionLocal
 from backend.models import User
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated=["bcrypt"],
+    argon2__type="id",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1
+)
 
 def create_owner(email, password):
     db = SessionLocal()
@@ -6,16 +6,34 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from backend.database import engine
 from sqlalchemy import text
 
+def _run_step(conn, description: str, statements):
+    """Runs one migration step in its own transaction, so a failing step does not undo the others."""
+    try:
+        for statement in statements:
+            conn.execute(text(statement))
+        conn.commit()
+        print(f"✅ {description}")
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ {description} failed: {e}")
+        return False
+
 def migrate_db():
     with engine.connect() as conn:
         print("Migrating database...")
-        try:
+        # Schema changes and the feedback dedup can outlast the app's per-statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.commit()
+        
+        results = [
             # Add role and is_active to user_accounts
-            conn.execute(text("ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS role VARCHAR DEFAULT 'USER'"))
-            conn.execute(text("ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS is_active INTEGER DEFAULT 1"))
-            
+            _run_step(conn, "user_accounts role/is_active columns", [
+                "ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS role VARCHAR DEFAULT 'USER'",
+                "ALTER TABLE user_accounts ADD COLUMN IF NOT EXISTS is_active INTEGER DEFAULT 1",
+            ]),
             # Create system_configs table if not exists
-            conn.execute(text("""
+            _run_step(conn, "system_configs table", ["""
                 CREATE TABLE IF NOT EXISTS system_configs (
                     id SERIAL PRIMARY KEY,
                     key VARCHAR UNIQUE NOT NULL,
@@ -23,12 +41,24 @@ def migrate_db():
                     description VARCHAR,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
-            """))
-            
-            conn.commit()
+            """]),
+            # Composite index for action-filtered, newest-first audit log pages
+            _run_step(conn, "audit_logs (action, timestamp) index", [
+                "CREATE INDEX IF NOT EXISTS idx_auditlog_action_ts ON audit_logs (action, timestamp DESC)",
+            ]),
+            # One feedback per query_id: drop older duplicates, then enforce it with a partial unique index
+            _run_step(conn, "user_feedback query_id dedup", ["""
+                DELETE FROM user_feedback a USING user_feedback b
+                WHERE a.query_id IS NOT NULL AND a.query_id = b.query_id AND a.id > b.id
+            """]),
+            _run_step(conn, "user_feedback query_id unique index", [
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_feedback_query_id ON user_feedback (query_id) WHERE query_id IS NOT NULL",
+            ]),
+        ]
+        if all(results):
             print("✅ Migration successful.")
-        except Exception as e:
-            print(f"❌ Migration failed: {e}")
+        else:
+            print("❌ Migration finished with failed steps (see above); re-run after fixing them.")
 
 if __name__ == "__main__":
     migrate_db()
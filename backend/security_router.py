@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from .database import get_db
 from .models import User, ChangePasswordTOTP
-from .auth import get_current_user, pwd_context
+from .auth import get_current_user, pwd_context, run_hash
 from .totp_utils import TOTPUtility
 from .schemas import TOTPInitOut, TOTPVerifyIn, PasswordChangeIn
 from .audit_logger import audit_logger
@@ -156,8 +156,10 @@ async def complete_password_change(
     # Validate and update password
     validate_password_strength(payload.new_password)
     
-    hashed_password = pwd_context.hash(payload.new_password)
-    current_user.password = hashed_password
+    hashed_password = await run_hash(pwd_context.hash, payload.new_password)
+    # current_user may be a cached, detached instance; update the row owned by this session
+    user = db.query(User).filter(User.id == current_user.id).first()
+    user.password = hashed_password
     
     # Delete the TOTP request after success
     db.delete(totp_entry)
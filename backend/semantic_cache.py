@@ -0,0 +1,124 @@
+# backend/semantic_cache.py
+import re
+import asyncio
+import logging
+import numpy as np
+from cachetools import TTLCache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from .rag_service import rag_service
+
+# Child of llm_service's queued logger (this module is only used on its request path), so records
+# propagate to that QueueHandler instead of writing to stdout from the request coroutine
+logger = logging.getLogger(f"{__package__}.llm_service.semantic_cache")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(query_lower: str) -> str:
+    return _WHITESPACE_RE.sub(" ", query_lower).strip()
+
+def evidence_signature(docs: List[Dict[str, Any]]) -> FrozenSet[Tuple[str, str]]:
+    """The set of retrieved documents (source, title) an answer was grounded on."""
+    return frozenset((d.get("source", ""), d.get("title", "")) for d in docs)
+
+def evidence_overlap(a: FrozenSet, b: FrozenSet) -> float:
+    """Jaccard similarity of two evidence signatures (two empty signatures match)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class SemanticAnswerCache:
+    """
+    Two-level cache of finished answers for general (non-personalized) questions.
+
+    L1: exact match on the case/whitespace-normalized query.
+    L2: cosine similarity >= SIMILARITY_THRESHOLD between query embeddings (the RAG embedder),
+        restricted to entries with the same scope (e.g. routed intent).
+
+    L2 rows sit in a fixed-size ring buffer and are only served while their L1 entry is alive,
+    so the TTL and LRU-style eviction of the answer store also retire the embeddings.
+
+    Each answer is stored with the evidence signature it was generated from. Callers should only
+    serve a hit once today's retrieval still overlaps it by MIN_EVIDENCE_OVERLAP (grounding gate),
+    so answers go stale with the knowledge base instead of outliving it.
+    """
+    TTL_SECONDS = 3600
+    MAX_ENTRIES = 4096  # ~4096 x (answer + 768-dim float32 vector), well under 100 MB
+    SIMILARITY_THRESHOLD = 0.95
+    MIN_EVIDENCE_OVERLAP = 0.5
+
+    def __init__(self):
+        self._answers = TTLCache(maxsize=self.MAX_ENTRIES, ttl=self.TTL_SECONDS)
+        self._matrix: Optional[np.ndarray] = None
+        self._row_keys: list = [None] * self.MAX_ENTRIES
+        self._rows_written = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return rag_service.model is not None
+
+    async def embed(self, norm_query: str) -> Optional[np.ndarray]:
+        """
+        Unit-length query embedding (model inference runs in a worker thread).
+        An embedder failure is treated as a cache miss (None) rather than failing the request.
+        """
+        if not self.semantic_enabled:
+            return None
+        try:
+            vector = np.asarray(await asyncio.to_thread(rag_service.get_embedding, norm_query), dtype=np.float32)
+        except Exception as e:
+            logger.warning("⚠️ Answer cache embedding failed, treating as a miss: %s", e)
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def lookup(self, norm_query: str, scope: Tuple) -> Tuple[Optional[Tuple[Any, FrozenSet]], Optional[np.ndarray]]:
+        """
+        Returns ((answer, evidence), query_vector). The entry is None on a miss; the vector
+        (if computed) should be passed back to store() so the query is not embedded twice.
+        """
+        entry = self._answers.get((norm_query, scope))
+        if entry is not None:
+            return entry, None
+
+        vector = await self.embed(norm_query)
+        if vector is None or self._matrix is None:
+            return None, vector
+
+        filled = min(self._rows_written, self.MAX_ENTRIES)
+        similarities = self._matrix[:filled] @ vector
+        candidates = np.flatnonzero(similarities >= self.SIMILARITY_THRESHOLD)
+        # Most similar first
+        for row in candidates[np.argsort(-similarities[candidates])]:
+            key = self._row_keys[row]
+            if key is None or key[1] != scope:
+                continue
+            entry = self._answers.get(key)
+            if entry is not None:
+                return entry, vector
+            self._row_keys[row] = None  # Expired or evicted from L1
+        return None, vector
+
+    def is_grounded(self, cached_evidence: FrozenSet, current_evidence: FrozenSet) -> bool:
+        return evidence_overlap(cached_evidence, current_evidence) >= self.MIN_EVIDENCE_OVERLAP
+
+    def store(self, norm_query: str, scope: Tuple, answer: Any, vector: Optional[np.ndarray] = None,
+              evidence: FrozenSet = frozenset()):
+        key = (norm_query, scope)
+        self._answers[key] = (answer, evidence)
+        if vector is None:
+            return
+        if self._matrix is None:
+            self._matrix = np.zeros((self.MAX_ENTRIES, vector.shape[0]), dtype=np.float32)
+        row = self._rows_written % self.MAX_ENTRIES
+        self._matrix[row] = vector
+        self._row_keys[row] = key
+        self._rows_written += 1
+
+    def clear(self):
+        self._answers.clear()
+        self._matrix = None
+        self._row_keys = [None] * self.MAX_ENTRIES
+        self._rows_written = 0
+
+# Instantiate the service
+semantic_cache = SemanticAnswerCache()
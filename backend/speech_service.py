@@ -1,25 +1,22 @@
 import os
 import uuid
-from groq import Groq
+from groq import AsyncGroq
 from gtts import gTTS
-from dotenv import load_dotenv
 from fastapi import UploadFile
-
-# Load environment variables from .env file
-load_dotenv()
+from .config import settings
 
 # --- Initialize Groq Client ---
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_KEY = settings().GROQ_API_KEY
 groq_client = None
 if GROQ_API_KEY:
-    groq_client = Groq(api_key=GROQ_API_KEY)
-    print("✅ Groq client for Speech-to-Text initialized.")
+    groq_client = AsyncGroq(api_key=GROQ_API_KEY)
+    print("✅ Async Groq client for Speech-to-Text initialized.")
 else:
     print("⚠️ WARNING: GROQ_API_KEY not found! Speech-to-Text service will be disabled.")
 
 STT_MODEL = "whisper-large-v3"
 
-def speech_to_text(audio_file: UploadFile) -> str:
+async def speech_to_text(audio_file: UploadFile) -> str:
     """
     Transcribes an audio file using Groq's Whisper model.
     """
@@ -28,9 +25,9 @@ def speech_to_text(audio_file: UploadFile) -> str:
 
     try:
         # Pass the file as a (filename, file_object) tuple, which the client expects.
-        file_tuple = (audio_file.filename, audio_file.file)
+        file_tuple = (audio_file.filename, await audio_file.read())
 
-        transcription = groq_client.audio.transcriptions.create(
+        transcription = await groq_client.audio.transcriptions.create(
             model=STT_MODEL,
             file=file_tuple,
             response_format="verbose_json"
@@ -1,5 +1,6 @@
 # backend/structured_memory.py
 import os
+import re
 from datetime import datetime, timezone
 from pymongo import MongoClient
 from dotenv import load_dotenv
@@ -21,7 +22,26 @@ if MONGO_URI:
 else:
     print("⚠️ WARNING: MONGO_URI not found for structured memory.")
 
+# Serves get_relevant_history (newest chunks per user) as an index seek
+if memory_collection is not None:
+    try:
+        memory_collection.create_index([("user_id", 1), ("timestamp", -1)])
+    except Exception as e:
+        print(f"⚠️ WARNING: Could not ensure structured memory index. Error: {e}")
+
+NO_MEMORY_CONTEXT = "No relevant past medical context found."
+
+_TERM_RE = re.compile(r"[a-z0-9]{3,}")
+
+def _terms(text: str) -> set:
+    return set(_TERM_RE.findall(text.lower()))
+
 class StructuredMemory:
+    # Caps on the context handed to the memory-selector prompt, so its size (and the
+    # selector's latency) stays flat however verbose the stored chunks are
+    MAX_CHUNK_CHARS = 300
+    MAX_MEMORY_CHARS = 1500
+
     def store_chunk(self, user_id: str, chunk_type: str, content: str, confidence: str = "user_reported"):
         """
         Stores a specific medical context chunk (e.g., past_symptom, allergy, preference, medication).
@@ -64,16 +84,28 @@ class StructuredMemory:
             print(f"❌ ERROR: Failed to retrieve structured memory. Error: {e}")
             return []
 
-    def summarize_memory(self, chunks: List[Dict[str, Any]]) -> str:
+    def summarize_memory(self, chunks: List[Dict[str, Any]], query: str = "") -> str:
         """
         Converts memory chunks into a readable string for LLM context.
+        Chunks sharing the most terms with the query come first (ties keep recency order);
+        each chunk is truncated to MAX_CHUNK_CHARS and the whole summary to MAX_MEMORY_CHARS.
         """
         if not chunks:
-            return "No relevant past medical context found."
+            return NO_MEMORY_CONTEXT
+        
+        if query:
+            query_terms = _terms(query)
+            chunks = sorted(chunks, key=lambda chunk: -len(query_terms & _terms(chunk['content'])))
         
         summary = "Known medical context from previous interactions:\n"
         for chunk in chunks:
-            summary += f"- [{chunk['type']}] {chunk['content']}\n"
+            content = chunk['content']
+            if len(content) > self.MAX_CHUNK_CHARS:
+                content = content[:self.MAX_CHUNK_CHARS].rstrip() + "..."
+            line = f"- [{chunk['type']}] {content}\n"
+            if len(summary) + len(line) > self.MAX_MEMORY_CHARS:
+                break
+            summary += line
         return summary
 
 # Instantiate the service
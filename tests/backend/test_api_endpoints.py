@@ -4,7 +4,8 @@ from fastapi.testclient import TestClient
 from backend.main import app
 from backend.database import get_db
 from backend.auth import get_current_user
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock, patch
+from backend.feedback_router import get_optional_user
 
 # Mock dependencies
 mock_db = MagicMock()
@@ -44,3 +45,32 @@ def test_clear_history():
             response = client.delete("/dashboard/history")
             assert response.status_code == 200
             assert response.json() == {"message": "Chat history cleared successfully"}
+
+def test_submit_feedback_accepts_and_drops_duplicates():
+    """Feedback is accepted with 202; a repeat for the same query_id is audited as a duplicate, not stored."""
+    db = AsyncMock()
+    # First INSERT ... ON CONFLICT DO NOTHING returns the new id, the repeat returns no row
+    db.execute.side_effect = [
+        MagicMock(first=MagicMock(return_value=(1,))),
+        MagicMock(first=MagicMock(return_value=None)),
+    ]
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__.return_value = db
+
+    app.dependency_overrides[get_optional_user] = lambda: None
+    try:
+        with patch("backend.feedback_router.AsyncSessionLocal", session_factory), \
+             patch("backend.feedback_router.audit_logger.log_event", new_callable=AsyncMock) as log_event:
+            payload = {"query_id": "q-123", "helpful": True}
+            first = client.post("/feedback/", json=payload)
+            second = client.post("/feedback/", json=payload)
+    finally:
+        del app.dependency_overrides[get_optional_user]
+
+    assert first.status_code == second.status_code == 202
+    assert db.execute.call_count == 2
+    assert db.commit.await_count == 2
+    first_event, second_event = [c.kwargs for c in log_event.await_args_list]
+    assert first_event["status"] == "SUCCESS"
+    assert second_event["status"] == "FAILURE"
+    assert second_event["metadata"] == {"reason": "Duplicate feedback for query", "query_id": "q-123"}
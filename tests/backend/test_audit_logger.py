@@ -0,0 +1,58 @@
+
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from backend.audit_logger import AuditLogger
+
+@pytest.fixture
+def session():
+    """A fake DB session recording every INSERT it is given."""
+    db = MagicMock()
+    with patch("backend.audit_logger.SessionLocal", return_value=db):
+        yield db
+
+def written_rows(session):
+    return [c.args[1] for c in session.execute.call_args_list]
+
+@pytest.mark.asyncio
+async def test_audit_events_are_written_in_one_batch_with_ids(session):
+    """Queued events are flushed together as one multi-row INSERT; ids are assigned by the writer."""
+    audit = AuditLogger()
+    for i in range(3):
+        await audit.log_event(action=f"EVENT_{i}", status="SUCCESS")
+    await audit.shutdown()
+
+    batches = written_rows(session)
+    assert len(batches) == 1
+    assert [row["action"] for row in batches[0]] == ["EVENT_0", "EVENT_1", "EVENT_2"]
+    assert len({row["log_id"] for row in batches[0]}) == 3
+    session.commit.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_audit_shutdown_flushes_pending_events(session):
+    """shutdown() pushes the None sentinel, so a partial batch is written without waiting for the interval."""
+    audit = AuditLogger()
+    audit.FLUSH_INTERVAL = 60
+    await audit.log_event(action="USER_LOGIN", status="SUCCESS")
+    await asyncio.wait_for(audit.shutdown(), timeout=5)
+
+    assert [row["action"] for row in written_rows(session)[0]] == ["USER_LOGIN"]
+
+@pytest.mark.asyncio
+async def test_audit_failed_batch_is_retried_row_by_row(session):
+    """A batch INSERT failure only drops the offending row, not the whole batch."""
+    def execute(statement, params):
+        if isinstance(params, list) or params["action"] == "BAD":
+            raise ValueError("unserializable metadata")
+    session.execute.side_effect = execute
+
+    audit = AuditLogger()
+    for action in ("GOOD_1", "BAD", "GOOD_2"):
+        await audit.log_event(action=action, status="SUCCESS")
+    await audit.shutdown()
+
+    singles = [params["action"] for params in written_rows(session) if isinstance(params, dict)]
+    assert singles == ["GOOD_1", "BAD", "GOOD_2"]
+    # Rollback after the batch and after the bad row; the two good rows are committed
+    assert session.rollback.call_count == 2
+    assert session.commit.call_count == 2
@@ -0,0 +1,36 @@
+
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.models import AuditLog
+from backend.dashboard_service import get_audit_logs
+
+def test_audit_log_pages_cover_rows_sharing_a_timestamp():
+    """Keyset pages neither skip nor repeat rows that share the boundary timestamp."""
+    engine = create_engine("sqlite://")
+    AuditLog.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    ts = datetime(2026, 1, 1, 12, 0, 0)
+    # Five rows on the same timestamp (as a flushed audit batch produces), two older ones
+    db.add_all([
+        AuditLog(log_id=str(i), timestamp=ts if i < 5 else ts - timedelta(seconds=i),
+                 action="USER_LOGIN", status="SUCCESS", source="api")
+        for i in range(7)
+    ])
+    db.commit()
+
+    seen = []
+    before_ts = before_id = None
+    while True:
+        page = get_audit_logs(limit=2, before_ts=before_ts, before_id=before_id, action=None,
+                              current_user=None, db=db)
+        if not page["logs"]:
+            assert page["next_before"] is None
+            break
+        seen.extend(log.id for log in page["logs"])
+        before_ts, before_id = page["next_before"]["ts"], page["next_before"]["id"]
+
+    assert len(seen) == len(set(seen)) == 7
+    # Newest first, ties broken by id descending
+    assert seen == [5, 4, 3, 2, 1, 6, 7]
+    db.close()
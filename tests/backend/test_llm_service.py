@@ -1,9 +1,17 @@
 
+import asyncio
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
-from backend.llm_service import call_llm_with_fallback, PRIMARY_MODEL, FALLBACK_MODEL
+from backend.llm_service import call_llm_with_fallback, PRIMARY_MODEL, FALLBACK_MODEL, _completion_cache
 import groq
 
+@pytest.fixture(autouse=True)
+def clear_completion_cache():
+    """Each test sees a cold completion cache."""
+    _completion_cache.clear()
+    yield
+    _completion_cache.clear()
+
 @pytest.mark.asyncio
 async def test_call_llm_with_fallback_primary_success():
     """Test that call_llm_with_fallback returns primary model response on success."""
@@ -52,3 +60,38 @@ async def test_call_llm_with_fallback_both_fail():
             await call_llm_with_fallback(messages)
         
         assert mock_create.call_count == 2
+
+@pytest.mark.asyncio
+async def test_call_llm_with_fallback_caches_identical_requests():
+    """Test that an identical request is served from the completion cache."""
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock(message=MagicMock(content="Cached Success"))]
+    
+    with patch("backend.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_response
+        
+        messages = [{"role": "user", "content": "hello"}]
+        first = await call_llm_with_fallback(messages)
+        second = await call_llm_with_fallback(messages)
+        
+        assert first == second == "Cached Success"
+        mock_create.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_call_llm_with_fallback_coalesces_concurrent_identical_requests():
+    """Test that identical requests issued concurrently share a single upstream call."""
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock(message=MagicMock(content="Shared Success"))]
+    
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.01)
+        return mock_response
+    
+    with patch("backend.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = slow_create
+        
+        messages = [{"role": "user", "content": "hello"}]
+        results = await asyncio.gather(*(call_llm_with_fallback(messages) for _ in range(3)))
+        
+        assert results == ["Shared Success"] * 3
+        mock_create.assert_called_once()
@@ -0,0 +1,60 @@
+
+import pytest
+from unittest.mock import patch
+from backend.semantic_cache import SemanticAnswerCache, evidence_signature
+
+VECTORS = {
+    "i have a headache": [1.0, 0.0, 0.0],
+    "i have headache": [0.99, 0.05, 0.0],  # near-duplicate phrasing
+    "what is diabetes": [0.0, 1.0, 0.0],
+}
+
+@pytest.fixture
+def cache():
+    with patch("backend.semantic_cache.rag_service") as mock_rag:
+        mock_rag.model = object()
+        mock_rag.get_embedding.side_effect = lambda text: VECTORS[text]
+        yield SemanticAnswerCache()
+
+@pytest.mark.asyncio
+async def test_semantic_cache_exact_and_similar_hits(cache):
+    """Exact repeats and near-identical queries in the same scope reuse the stored answer."""
+    entry, vector = await cache.lookup("i have a headache", ("symptom_based", True))
+    assert entry is None
+    cache.store("i have a headache", ("symptom_based", True), "cached answer", vector)
+
+    assert (await cache.lookup("i have a headache", ("symptom_based", True)))[0][0] == "cached answer"
+    assert (await cache.lookup("i have headache", ("symptom_based", True)))[0][0] == "cached answer"
+
+@pytest.mark.asyncio
+async def test_semantic_cache_respects_scope_and_similarity(cache):
+    """Dissimilar queries and other scopes (intent) never share an answer."""
+    _, vector = await cache.lookup("i have a headache", ("symptom_based", True))
+    cache.store("i have a headache", ("symptom_based", True), "cached answer", vector)
+
+    assert (await cache.lookup("what is diabetes", ("symptom_based", True)))[0] is None
+    assert (await cache.lookup("i have headache", ("disease_based", True)))[0] is None
+
+def test_semantic_cache_grounding_gate(cache):
+    """A cached answer is only reusable while retrieval still returns mostly the same evidence."""
+    cached = evidence_signature([
+        {"source": "MedlinePlus", "title": "Headache"},
+        {"source": "WHO", "title": "Headache disorders"},
+    ])
+    same = evidence_signature([
+        {"source": "WHO", "title": "Headache disorders"},
+        {"source": "MedlinePlus", "title": "Headache"},
+    ])
+    changed = evidence_signature([
+        {"source": "PubMed", "title": "Migraine trial"},
+        {"source": "MedlinePlus", "title": "Headache"},
+        {"source": "ICD-11", "title": "8A80 Migraine"},
+    ])
+    assert cache.is_grounded(cached, same)
+    assert not cache.is_grounded(cached, changed)
+
+@pytest.mark.asyncio
+async def test_semantic_cache_embedding_failure_is_a_miss(cache):
+    """An embedder error must not fail the request; the lookup simply misses."""
+    with patch("backend.semantic_cache.rag_service.get_embedding", side_effect=RuntimeError("embedder down")):
+        assert await cache.lookup("i have a headache", ("symptom_based", True)) == (None, None)